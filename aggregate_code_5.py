@@ -0,0 +1,123 @@
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from columnar_io import write_table
+
+# Same aggregation as aggregate_code_4.py, but instead of 16 successive outer
+# merges (each re-sorting and copying an ever wider frame) every file is read
+# in parallel, indexed on Node_ID, and the wide table is built with a single
+# aligned concat. Column names and suffixes follow the merge rules exactly.
+
+def read_spreadsheet(file):
+    """ Load one file indexed on its first column (renamed Node_ID), duplicates dropped """
+    # Dynamically determine the file type based on file extension
+    if file.endswith('.tsv'):
+        sep = '\t'  # For TSV files, use tab as separator
+    elif file.endswith('.csv'):
+        sep = ','  # For CSV files, use comma as separator
+    else:
+        print(f"Warning: '{file}' is not a recognized file type (.csv or .tsv), skipping.")
+        return None
+
+    df = pd.read_csv(file, sep=sep)
+    df.rename(columns={df.columns[0]: 'Node_ID'}, inplace=True)
+    df = df.drop_duplicates(subset='Node_ID')
+    return df.set_index('Node_ID')
+
+def merged_column_names(files, frames):
+    """ Column names pd.merge(..., suffixes=('', suffix)) would give, file by file """
+    seen = set()
+    names = []
+    for file, df in zip(files, frames):
+        # Add suffixes to distinguish the columns from different files
+        suffix = f"_{file.split('.')[0]}"  # Use file name (excluding extension) as suffix
+        renamed = []
+        for col in df.columns:
+            if col in seen:
+                new = f"{col}{suffix}"
+                if new in seen:
+                    # split('.') truncates names like '..._cpm_0.01.csv' to a suffix an earlier
+                    # file already used; pandas refuses the duplicate, so use the full stem instead
+                    new = f"{col}_{os.path.splitext(file)[0]}"
+                col = new
+            renamed.append(col)
+        seen.update(renamed)
+        names.append(renamed)
+    return names
+
+def aggregate_spreadsheets(files, workers=8):
+    """ Outer-join all files on Node_ID in one aligned concat """
+    present = []
+    for file in files:
+        # Check if the file exists
+        if not os.path.exists(file):
+            print(f"Warning: '{file}' does not exist, skipping.")
+        else:
+            present.append(file)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        loaded = list(pool.map(read_spreadsheet, present))
+    files = [f for f, df in zip(present, loaded) if df is not None]
+    frames = [df for df in loaded if df is not None]
+    if not frames:
+        return None
+
+    for df, names in zip(frames, merged_column_names(files, frames)):
+        df.columns = names
+    # An outer merge on Node_ID returns the keys sorted
+    aggregated_data = pd.concat(frames, axis=1, join='outer').sort_index()
+    aggregated_data.index.name = 'Node_ID'
+    aggregated_data = aggregated_data.reset_index()
+    print(f"Aggregated {len(frames)} files, data shape is: {aggregated_data.shape}")
+    return aggregated_data
+
+# List of your files to aggregate
+files = [
+    'cit_hepph_cleaned.tsv',
+    'bdid_clustered-cit_hepph_cpm_0.001.csv',
+    'bdid-cit_hepph_cpm_0.001.csv',
+    'cit_hepph_cpm_0.001.tsv',
+    'degstats-cit_hepph_cleaned-cit_hepph_cpm_0.001.csv',
+    'bdid_clustered-cit_hepph_cpm_0.01.csv',
+    'bdid-cit_hepph_cpm_0.01.csv',
+    'cit_hepph_cpm_0.01.tsv',
+    'degstats-cit_hepph_cleaned-cit_hepph_cpm_0.01.csv',
+    'bdid_clustered-cit_hepph_cpm_0.1.csv',
+    'bdid-cit_hepph_cpm_0.1.csv',
+    'cit_hepph_cpm_0.1.tsv',
+    'degstats-cit_hepph_cleaned-cit_hepph_cpm_0.1.csv',
+    'bdid_clustered-cit_hepph_modularity.csv',
+    'bdid-cit_hepph_modularity.csv',
+    'cit_hepph_modularity.tsv',
+    'degstats-cit_hepph_cleaned-cit_hepph_modularity.csv'
+]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Aggregate node-level spreadsheets on Node_ID.')
+    parser.add_argument(
+        'files', metavar='file', type=str, nargs='*', default=files,
+        help='files to aggregate (default: the cit_hepph list above)'
+        )
+    parser.add_argument(
+        '-o', metavar='output', type=str, default='aggregated_statistics.tsv',
+        help='output path; .parquet / .feather write typed columnar files instead of TSV'
+        )
+    parser.add_argument(
+        '-w', metavar='workers', type=int, default=8,
+        help='files read in parallel'
+        )
+    args = parser.parse_args()
+
+    # Aggregate the data from the files
+    aggregated_df = aggregate_spreadsheets(args.files, workers=args.w)
+
+    # Check the aggregated data
+    if aggregated_df is not None:
+        print(aggregated_df.head())
+        write_table(aggregated_df, args.o)
+        print(f"Saved to {args.o}")
+    else:
+        print("No files were successfully loaded or aggregated.")
@@ -0,0 +1,336 @@
+# BDID statistics computed from a graph_store / edge list.
+#
+# For a focal paper f with citing papers C (cite f) and references R (cited by f):
+#   cp_level             |C|
+#   cp_r_citing_zero     citing papers c whose references include no other paper of C
+#   cp_r_citing_nonzero  citing papers c whose references include at least one paper of C
+#   tr_citing            sum over c in C of |refs(c) & C|
+#   cp_r_cited_zero      citing papers c whose references include none of R
+#   cp_r_cited_nonzero   citing papers c whose references include at least one of R
+#   tr_cited             sum over c in C of |refs(c) & R|
+# With A the adjacency matrix (A[c, f] = 1 when c cites f), |refs(c) & C| is
+# (A @ A)[c, f] and |refs(c) & R| is (A @ A.T)[c, f], read at the edges c -> f.
+# Both products are computed a block of rows at a time and masked by A, so no
+# per-node neighbor walks happen in Python.
+#
+# The cluster-restricted (_y) statistics are the same quantities on the graph
+# that keeps only edges whose endpoints share a cluster. As in the legacy
+# output_*.csv tables they are NaN for a node with no such edge, and nodes
+# without a cluster have no row.
+#
+# For several resolutions at once, batched_bdid enumerates every wedge
+# (edge c -> f plus a witness k counted above) among edges that are
+# intra-cluster under some partition a single time, and only filters it per
+# partition at the end: a wedge counts under partition p when c, f and k are
+# all in the same cluster of p.
+#
+# Usage: python bdid.py -g cit_hepph_store -o output/ cit_hepph_cpm_0.01.tsv ...
+#        python bdid.py -g cit_hepph_store -p cit_hepph_partitions -o output/
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from columnar_io import write_table
+from cluster_edges import MISSING, lookup_clusters, load_membership
+from graph_store import load_graph
+from manifest import Manifest
+from partition_matrix import load_partition_matrix, partition_rows, resolution_label
+
+BDID_COLUMNS = ['cp_level', 'cp_r_citing_zero', 'cp_r_citing_nonzero', 'tr_citing',
+                'cp_r_cited_zero', 'cp_r_cited_nonzero', 'tr_cited']
+
+# Rows of A multiplied at a time; bounds the size of the intermediate products
+DEFAULT_BLOCK_ROWS = 50_000
+
+# Wedges enumerated at a time by batched_bdid
+DEFAULT_BLOCK_WEDGES = 20_000_000
+
+
+def adjacency(graph, keep=None):
+    """ Binary CSR adjacency of the graph, optionally only the edges where keep is True """
+    src, dst = graph.edges()
+    if keep is not None:
+        src, dst = src[keep], dst[keep]
+    n = graph.n_nodes
+    A = sp.csr_matrix((np.ones(len(src), dtype=np.int64), (src, dst)), shape=(n, n))
+    A.sum_duplicates()
+    A.data[:] = 1
+    return A
+
+
+def _as_bdid(counts):
+    cp_level, citing_nonzero, tr_citing, cited_nonzero, tr_cited = counts
+    return {
+        'cp_level': cp_level,
+        'cp_r_citing_zero': cp_level - citing_nonzero,
+        'cp_r_citing_nonzero': citing_nonzero,
+        'tr_citing': tr_citing,
+        'cp_r_cited_zero': cp_level - cited_nonzero,
+        'cp_r_cited_nonzero': cited_nonzero,
+        'tr_cited': tr_cited,
+    }
+
+
+def _masked_product_counts(block, right, n):
+    """ Per focal column f: edges c -> f with a nonzero (block @ right)[c, f], and their sum """
+    overlap = block.dot(right).multiply(block).tocoo()
+    overlap.eliminate_zeros()
+    nonzero = np.bincount(overlap.col, minlength=n)
+    total = np.bincount(overlap.col, weights=overlap.data, minlength=n).astype(np.int64)
+    return nonzero, total
+
+
+def bdid_from_adjacency(A, block_rows=DEFAULT_BLOCK_ROWS):
+    """ The seven BDID columns for every node of adjacency A, as int64 arrays """
+    n = A.shape[0]
+    A = A.tocsr()
+    AT = A.T.tocsr()
+
+    citing_nonzero = np.zeros(n, dtype=np.int64)
+    tr_citing = np.zeros(n, dtype=np.int64)
+    cited_nonzero = np.zeros(n, dtype=np.int64)
+    tr_cited = np.zeros(n, dtype=np.int64)
+    for start in range(0, n, block_rows):
+        block = A[start:start + block_rows]
+        # citing side: c -> k -> f paths, k being another citer of f
+        nonzero, total = _masked_product_counts(block, A, n)
+        citing_nonzero += nonzero
+        tr_citing += total
+        # cited side: c -> k <- f, k being one of f's references
+        nonzero, total = _masked_product_counts(block, AT, n)
+        cited_nonzero += nonzero
+        tr_cited += total
+
+    cp_level = np.diff(AT.indptr).astype(np.int64)
+    return _as_bdid((cp_level, citing_nonzero, tr_citing, cited_nonzero, tr_cited))
+
+
+def intra_cluster_mask(graph, node_cluster):
+    """ True for edges whose endpoints share an (assigned) cluster; node_cluster is indexed by dense id """
+    src, dst = graph.edges()
+    cu, cv = node_cluster[src], node_cluster[dst]
+    return (cu == cv) & (cu != MISSING)
+
+
+def network_bdid(graph, block_rows=DEFAULT_BLOCK_ROWS):
+    """ Network-wide BDID table keyed by fp_int_id, like bdid-*.csv """
+    stats = bdid_from_adjacency(adjacency(graph), block_rows)
+    return pd.DataFrame({'fp_int_id': np.asarray(graph.node_ids), **stats})
+
+
+def cluster_bdid(graph, node_cluster, block_rows=DEFAULT_BLOCK_ROWS):
+    """ Cluster-restricted BDID table (intra-cluster edges only), like bdid_clustered-*.csv """
+    A = adjacency(graph, keep=intra_cluster_mask(graph, node_cluster))
+    stats = bdid_from_adjacency(A, block_rows)
+    return pd.DataFrame({'fp_int_id': np.asarray(graph.node_ids), **stats})
+
+
+def _edge_blocks(indptr, max_wedges):
+    """ Split a CSR edge range into blocks of at most ~max_wedges (edge, witness) pairs """
+    out_degree = np.diff(indptr)
+    cum_wedges = np.cumsum(np.repeat(out_degree, out_degree))
+    total = cum_wedges[-1] if len(cum_wedges) else 0
+    bounds = np.searchsorted(cum_wedges, np.arange(max_wedges, total, max_wedges))
+    bounds = np.unique(np.concatenate([[0], bounds, [len(cum_wedges)]]))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _has_edge(keys, edge_index):
+    """ Which u * n + v keys are edges; edge_index is a pandas Index of the edge keys """
+    # Hash lookups beat binary search by several times for these random probes
+    return edge_index.get_indexer(keys) >= 0
+
+
+def _stats_from_counts(focal, in_partition, citing, cited, n):
+    """ BDID columns from per-edge witness counts of the edges in one partition """
+    f = focal[in_partition]
+    citing, cited = citing[in_partition], cited[in_partition]
+    return np.stack([
+        np.bincount(f, minlength=n),
+        np.bincount(f[citing > 0], minlength=n),
+        np.bincount(f, weights=citing, minlength=n).astype(np.int64),
+        np.bincount(f[cited > 0], minlength=n),
+        np.bincount(f, weights=cited, minlength=n).astype(np.int64),
+    ])
+
+
+def batched_bdid(graph, clusters, block_rows=DEFAULT_BLOCK_ROWS, block_wedges=DEFAULT_BLOCK_WEDGES):
+    """ Network BDID plus cluster-restricted BDID under every partition
+
+    clusters is an (n_nodes, n_partitions) array of cluster ids indexed by the
+    graph's dense ids (MISSING for unassigned), e.g. from partition_rows.
+    Returns (network, [clustered stats per partition]).
+
+    The cluster-restricted part is one sweep over the edges that are
+    intra-cluster under at least one partition: every wedge (edge c -> f,
+    witness k) is found once, and a (partition x wedge) "all three in one
+    cluster" mask decides where it counts.
+    """
+    n = graph.n_nodes
+    clusters = np.asarray(clusters)
+    n_parts = clusters.shape[1]
+    network = bdid_from_adjacency(adjacency(graph), block_rows)
+
+    # Only edges inside a cluster of some partition can contribute to any _y statistic
+    src, dst = graph.edges()
+    intra_any = np.zeros(len(src), dtype=bool)
+    for p in range(n_parts):
+        intra_any |= intra_cluster_mask(graph, clusters[:, p])
+    A = adjacency(graph, keep=intra_any)
+    indptr, indices = A.indptr, A.indices.astype(np.int64)
+    src = np.repeat(np.arange(n, dtype=np.int64), np.diff(indptr))
+    # Hashed keys of those edges, for vectorized "does u -> v exist" lookups
+    edge_index = pd.Index(src * n + indices)
+
+    clustered = np.zeros((n_parts, 5, n), dtype=np.int64)
+    for start, stop in _edge_blocks(indptr, block_wedges):
+        c, f = src[start:stop], indices[start:stop]
+        n_edges = stop - start
+
+        # Every (edge c -> f, witness k in refs(c)) pair of the block
+        counts = indptr[c + 1] - indptr[c]
+        edge = np.repeat(np.arange(n_edges), counts)
+        offsets = np.arange(len(edge)) - np.repeat(np.cumsum(counts) - counts, counts)
+        k = indices[indptr[c][edge] + offsets]
+        fe = f[edge]
+
+        # citing witness: k -> f (k is another citer of f); cited witness: f -> k (k is a reference of f)
+        is_citing = _has_edge(k * n + fe, edge_index)
+        is_cited = _has_edge(fe * n + k, edge_index)
+        keep = is_citing | is_cited
+        edge, k, is_citing, is_cited = edge[keep], k[keep], is_citing[keep], is_cited[keep]
+
+        # Filter edges and wedges by "same cluster" under every partition at once
+        pc, pf = clusters[c], clusters[f]
+        edge_in = (pc == pf) & (pc != MISSING)
+        wedge_in = edge_in[edge] & (clusters[k] == pc[edge])
+        for p in range(n_parts):
+            w = wedge_in[:, p]
+            clustered[p] += _stats_from_counts(
+                f, edge_in[:, p],
+                np.bincount(edge[w & is_citing], minlength=n_edges),
+                np.bincount(edge[w & is_cited], minlength=n_edges), n)
+
+    return network, [_as_bdid(counts) for counts in clustered]
+
+
+def node_table(graph, node_cluster, network=None, clustered=None, block_rows=DEFAULT_BLOCK_ROWS):
+    """ One output_*.csv table: network (_x) and cluster (_y) BDID plus degree stats
+
+    network and clustered are the stat dicts from bdid_from_adjacency; pass
+    them in to reuse work across resolutions, otherwise they are computed.
+    As in the legacy tables, nodes without a cluster are left out and the _y
+    statistics are NaN for a node with no intra-cluster edge. Network and
+    cluster degrees both count distinct edges.
+    """
+    A = adjacency(graph)
+    if network is None:
+        network = bdid_from_adjacency(A, block_rows)
+    keep = intra_cluster_mask(graph, node_cluster)
+    A_intra = adjacency(graph, keep=keep)
+    if clustered is None:
+        clustered = bdid_from_adjacency(A_intra, block_rows)
+
+    network_in, network_out = np.diff(A.tocsc().indptr), np.diff(A.indptr)
+    cluster_in, cluster_out = np.diff(A_intra.tocsc().indptr), np.diff(A_intra.indptr)
+    # a node with no edge inside its cluster is not scored by the clustered BDID
+    scored = (cluster_in + cluster_out) > 0
+
+    table = {'Node_ID': np.asarray(graph.node_ids)}
+    table.update({f"{col}_x": network[col] for col in BDID_COLUMNS})
+    table['Cluster_ID'] = node_cluster
+    table.update({f"{col}_y": np.where(scored, clustered[col], np.nan) for col in BDID_COLUMNS})
+    table.update({
+        'network_degree': network_in + network_out,
+        'network_indegree': network_in,
+        'network_outdegree': network_out,
+        'cluster_degree': cluster_in + cluster_out,
+        'cluster_indegree': cluster_in,
+        'cluster_outdegree': cluster_out,
+    })
+    return pd.DataFrame(table)[node_cluster != MISSING].reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compute network and cluster-restricted BDID statistics.')
+    parser.add_argument(
+        'cluster_files', metavar='cluster_file', type=str, nargs='*',
+        help='membership TSVs; one output_<resolution>.csv is written per file'
+        )
+    parser.add_argument(
+        '-g', metavar='graph', type=str, required=True,
+        help='graph_store directory or cleaned edge-list path'
+        )
+    parser.add_argument(
+        '-o', metavar='out_dir', type=str, required=True,
+        help='output directory'
+        )
+    parser.add_argument(
+        '-p', metavar='partition_matrix', type=str, default=None,
+        help='partition_matrix directory; one output_<label>.csv per resolution'
+        )
+    parser.add_argument(
+        '-f', metavar='format', type=str, default='csv', choices=['csv', 'parquet', 'feather'],
+        help='output format (default csv)'
+        )
+    parser.add_argument(
+        '-b', metavar='block_rows', type=int, default=DEFAULT_BLOCK_ROWS,
+        help='adjacency rows multiplied per block'
+        )
+    parser.add_argument(
+        '-m', metavar='manifest', type=str, default=None,
+        help='content-hash manifest; resolutions whose inputs are unchanged are skipped'
+        )
+    args = parser.parse_args()
+
+    os.makedirs(args.o, exist_ok=True)
+    graph = load_graph(args.g)
+    node_ids = np.asarray(graph.node_ids)
+
+    if args.p:
+        pm = load_partition_matrix(args.p)
+        labels, clusters = pm.labels, partition_rows(graph, pm)
+        # Per-resolution inputs: the membership file a column came from, if recorded
+        sources = pm.sources or [args.p] * len(labels)
+    else:
+        labels = [resolution_label(f) for f in args.cluster_files]
+        clusters = np.column_stack(
+            [lookup_clusters(node_ids, *load_membership(f)) for f in args.cluster_files]
+            ) if args.cluster_files else np.empty((graph.n_nodes, 0), dtype=np.int64)
+        sources = args.cluster_files
+    out_paths = [os.path.join(args.o, f"output_{label}.{args.f}") for label in labels]
+
+    manifest = Manifest(args.m) if args.m else None
+    stale = list(range(len(labels)))
+    if manifest:
+        stale = [p for p in stale
+                 if not manifest.is_current('bdid', labels[p], [args.g, sources[p]], [out_paths[p]])]
+        for p in sorted(set(range(len(labels))) - set(stale)):
+            print(f"[{labels[p]}] inputs unchanged, reusing {out_paths[p]}")
+        if labels and not stale:
+            sys.exit(0)
+
+    if len(stale) > 1:
+        # One sweep over the edges serves the network and every resolution
+        network, batched = batched_bdid(graph, clusters[:, stale], block_rows=args.b)
+        clustered = dict(zip(stale, batched))
+    else:
+        network = bdid_from_adjacency(adjacency(graph), args.b)
+        clustered = {}
+
+    if not labels:
+        out_path = os.path.join(args.o, f"bdid.{args.f}")
+        write_table(pd.DataFrame({'fp_int_id': node_ids, **network}), out_path)
+        print(f"Network BDID saved to {out_path}")
+
+    for p in stale:
+        df = node_table(graph, clusters[:, p], network=network, clustered=clustered.get(p), block_rows=args.b)
+        write_table(df, out_paths[p])
+        if manifest:
+            manifest.record('bdid', labels[p], [args.g, sources[p]], [out_paths[p]])
+        print(f"[{labels[p]}] Saved {out_paths[p]}")
@@ -0,0 +1,178 @@
+# Per-cluster statistics for every column of every resolution's node table,
+# computed in one sorted-segment pass and stored as an on-disk cube.
+#
+# The cube directory holds:
+#   values.npy      (n_rows, n_columns, n_stats) float64
+#   resolution.npy  resolution index of every row
+#   cluster_ids.npy cluster id of every row
+#   meta.json       resolution labels, column names, statistic names and
+#                   which columns were integer in the source tables
+# Rows are (resolution, cluster) pairs sorted by resolution then cluster id,
+# so one resolution is a contiguous, memory-mappable slice.
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+BASE_STATS = ['count', 'sum', 'min', 'max', 'mean']
+OPTIONAL_STATS = ['var']
+
+# Quantile statistics are named q<percent>, e.g. q50 for the median
+def quantile_name(q):
+    return f"q{q * 100:g}"
+
+
+def _segment_quantile(values, starts, valid_counts, q):
+    """ Linear-interpolated quantile of each segment; values sorted within segments with NaN last """
+    pos = starts + q * np.maximum(valid_counts - 1, 0)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, starts + np.maximum(valid_counts - 1, 0))
+    frac = pos - lo
+    result = values[lo] + (values[hi] - values[lo]) * frac
+    return np.where(valid_counts > 0, result, np.nan)
+
+
+def aggregate_clusters(df, cluster_col, columns, variance=False, quantiles=()):
+    """ (cluster_ids, (n_clusters, n_columns, n_stats) array, stat names) for one node table
+
+    NaN values are skipped like pandas groupby aggregation: count is the
+    number of non-missing values, sum of an all-missing group is 0, and
+    min/max/mean/var/quantiles of an all-missing group are NaN. var uses ddof=1.
+    """
+    clusters = df[cluster_col].to_numpy()
+    keep = ~pd.isna(clusters)
+    order = np.argsort(clusters[keep], kind='stable')
+    sorted_clusters = clusters[keep][order]
+    values = df[columns].to_numpy(dtype=np.float64)[keep][order]
+
+    # Segment boundaries of each cluster in the sorted rows
+    boundary = np.flatnonzero(np.r_[True, sorted_clusters[1:] != sorted_clusters[:-1]]) if len(sorted_clusters) else np.array([], dtype=np.int64)
+    cluster_ids = sorted_clusters[boundary]
+    if not len(boundary):
+        names = BASE_STATS + (['var'] if variance else []) + [quantile_name(q) for q in quantiles]
+        return cluster_ids, np.empty((0, len(columns), len(names))), names
+
+    valid = ~np.isnan(values)
+    count = np.add.reduceat(valid, boundary, axis=0).astype(np.float64)
+    total = np.add.reduceat(np.where(valid, values, 0.0), boundary, axis=0)
+    low = np.minimum.reduceat(np.where(valid, values, np.inf), boundary, axis=0)
+    high = np.maximum.reduceat(np.where(valid, values, -np.inf), boundary, axis=0)
+    empty = count == 0
+    low[empty] = np.nan
+    high[empty] = np.nan
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+
+    stats = [count, total, low, high, mean]
+    names = list(BASE_STATS)
+    if variance:
+        centered = np.where(valid, values - np.repeat(mean, np.diff(np.r_[boundary, len(values)]), axis=0), 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = np.add.reduceat(centered ** 2, boundary, axis=0) / (count - 1)
+        var[count < 2] = np.nan
+        stats.append(var)
+        names.append('var')
+    if quantiles:
+        # Sort each column's values within their cluster segment (NaN last) once
+        segment = np.repeat(np.arange(len(boundary)), np.diff(np.r_[boundary, len(values)]))
+        for q in quantiles:
+            per_column = []
+            for j in range(values.shape[1]):
+                sorted_values = values[np.lexsort((values[:, j], segment)), j]
+                per_column.append(_segment_quantile(sorted_values, boundary, count[:, j].astype(np.int64), q))
+            stats.append(np.column_stack(per_column))
+            names.append(quantile_name(q))
+
+    return cluster_ids, np.stack(stats, axis=2), names
+
+
+class ClusterCube:
+    """ cluster x column x statistic values for every resolution """
+
+    def __init__(self, values, resolution, cluster_ids, labels, columns, stats, int_columns=()):
+        self.values = values
+        self.resolution = resolution
+        self.cluster_ids = cluster_ids
+        self.labels = list(labels)
+        self.columns = list(columns)
+        self.stats = list(stats)
+        self.int_columns = list(int_columns)
+
+    def _rows(self, label):
+        r = self.labels.index(label)
+        lo, hi = np.searchsorted(self.resolution, [r, r + 1])
+        return slice(lo, hi)
+
+    def block(self, label):
+        """ (cluster_ids, (n_clusters, n_columns, n_stats) values) of one resolution, as aggregate_clusters returns them """
+        rows = self._rows(label)
+        return np.asarray(self.cluster_ids[rows]), np.asarray(self.values[rows])
+
+    def get(self, label, columns=None, stats=None):
+        """ DataFrame indexed by Cluster_ID with (column, statistic) MultiIndex columns """
+        columns = columns or self.columns
+        stats = stats or self.stats
+        rows = self._rows(label)
+        ci = [self.columns.index(c) for c in columns]
+        si = [self.stats.index(s) for s in stats]
+        block = np.asarray(self.values[rows][:, ci][:, :, si])
+        frame = pd.DataFrame(
+            block.reshape(block.shape[0], -1),
+            index=pd.Index(np.asarray(self.cluster_ids[rows]), name='Cluster_ID'),
+            columns=pd.MultiIndex.from_product([columns, stats]),
+        )
+        # Integer source columns keep integer count/sum/min/max, as pandas groupby returns them
+        for col in columns:
+            if col not in self.int_columns:
+                continue
+            for stat in stats:
+                if stat in ('count', 'sum', 'min', 'max') and frame[(col, stat)].notna().all():
+                    frame[(col, stat)] = frame[(col, stat)].astype(np.int64)
+        return frame
+
+    def save(self, out_dir):
+        os.makedirs(out_dir, exist_ok=True)
+        np.save(os.path.join(out_dir, 'values.npy'), self.values)
+        np.save(os.path.join(out_dir, 'resolution.npy'), self.resolution)
+        np.save(os.path.join(out_dir, 'cluster_ids.npy'), self.cluster_ids)
+        meta = {'labels': self.labels, 'columns': self.columns, 'stats': self.stats,
+                'int_columns': self.int_columns}
+        with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+
+def build_cube(tables, cluster_col, columns, variance=False, quantiles=(), previous=None):
+    """ Cube over {label: node DataFrame}; every table must have cluster_col and columns
+
+    A table given as None is not re-aggregated: its rows are copied from the
+    previous cube, which must have been built with the same columns and stats.
+    """
+    blocks, resolution, cluster_ids = [], [], []
+    int_columns = set(columns)
+    stats = BASE_STATS + (['var'] if variance else []) + [quantile_name(q) for q in quantiles]
+    for r, (label, df) in enumerate(tables.items()):
+        if df is None:
+            ids, block = previous.block(label)
+            int_columns &= set(previous.int_columns)
+        else:
+            ids, block, stats = aggregate_clusters(df, cluster_col, columns, variance, quantiles)
+            int_columns &= {c for c in columns if pd.api.types.is_integer_dtype(df[c])}
+        blocks.append(block)
+        resolution.append(np.full(len(ids), r, dtype=np.int32))
+        cluster_ids.append(ids.astype(np.int64))
+    return ClusterCube(np.concatenate(blocks), np.concatenate(resolution), np.concatenate(cluster_ids),
+                       list(tables), columns, stats, [c for c in columns if c in int_columns])
+
+
+def load_cube(path, mmap_mode='r'):
+    """ Load a cube directory with values.npy memory-mapped """
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    return ClusterCube(
+        np.load(os.path.join(path, 'values.npy'), mmap_mode=mmap_mode),
+        np.load(os.path.join(path, 'resolution.npy')),
+        np.load(os.path.join(path, 'cluster_ids.npy')),
+        meta['labels'], meta['columns'], meta['stats'], meta.get('int_columns', []),
+    )
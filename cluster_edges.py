@@ -0,0 +1,215 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from graph_store import is_store, load_graph, read_edge_list
+
+# Cluster id given to nodes that are missing from a membership file
+MISSING = -1
+
+# Edges per chunk in streaming mode (~160MB of int64 endpoint arrays)
+DEFAULT_CHUNKSIZE = 10_000_000
+
+
+def load_edges(edge_file):
+    """ int64 (u, v) arrays from a graph_store directory or a headerless edge list """
+    if is_store(edge_file):
+        return load_graph(edge_file).original_edges()
+    return read_edge_list(edge_file)
+
+
+def iter_edge_chunks(edge_file, chunksize=DEFAULT_CHUNKSIZE):
+    """ Yield int64 (u, v) arrays of at most chunksize edges at a time
+
+    Text edge lists are read with pandas in chunks; graph_store directories
+    are sliced straight out of the memory-mapped CSR arrays.
+    """
+    if is_store(edge_file):
+        graph = load_graph(edge_file)
+        for start in range(0, graph.n_edges, chunksize):
+            stop = min(start + chunksize, graph.n_edges)
+            positions = np.arange(start, stop)
+            src = np.searchsorted(graph.out_indptr, positions, side='right') - 1
+            yield graph.node_ids[src], graph.node_ids[graph.out_indices[start:stop]]
+        return
+
+    reader = pd.read_csv(edge_file, sep='\t', header=None, usecols=[0, 1],
+                         dtype=np.int64, chunksize=chunksize)
+    for chunk in reader:
+        yield chunk[0].to_numpy(), chunk[1].to_numpy()
+
+
+def binary_membership_path(cluster_file):
+    """ 'cit_hepph_cpm_0.01.tsv' -> 'cit_hepph_cpm_0.01.npz' """
+    return os.path.splitext(cluster_file)[0] + '.npz'
+
+
+def save_membership(path, nodes, clusters):
+    """ Write int64 node / cluster id arrays in one go as an uncompressed .npz """
+    with open(path, 'wb') as f:
+        np.savez(f, nodes=np.asarray(nodes, dtype=np.int64), clusters=np.asarray(clusters, dtype=np.int64))
+
+
+def read_binary_membership(path):
+    """ int64 (nodes, clusters) arrays from a save_membership .npz """
+    with np.load(path) as data:
+        return data['nodes'], data['clusters']
+
+
+def load_membership(cluster_file):
+    """ Read a membership into int64 (nodes, clusters) arrays
+
+    .npz files are read directly. For a headerless node/cluster TSV, the .npz
+    the Leiden runners write next to it is used instead when it is at least
+    as new, so the text is only parsed when there is no binary copy.
+    """
+    if cluster_file.endswith('.npz'):
+        return read_binary_membership(cluster_file)
+    binary = binary_membership_path(cluster_file)
+    if os.path.exists(binary) and os.path.getmtime(binary) >= os.path.getmtime(cluster_file):
+        return read_binary_membership(binary)
+    df = pd.read_csv(cluster_file, sep='\t', header=None, usecols=[0, 1], dtype=np.int64)
+    return df[0].to_numpy(), df[1].to_numpy()
+
+
+def _sorted_lookup(nodes, clusters):
+    """ Nodes sorted for searchsorted, with their clusters """
+    # Reverse before np.unique so a node listed twice keeps its last cluster, like dict(zip(...))
+    sorted_nodes, first = np.unique(nodes[::-1], return_index=True)
+    return sorted_nodes, clusters[::-1][first]
+
+
+def _search(node_ids, sorted_nodes, sorted_clusters):
+    pos = np.searchsorted(sorted_nodes, node_ids)
+    pos = np.minimum(pos, len(sorted_nodes) - 1)
+    found = sorted_nodes[pos] == node_ids
+    return np.where(found, sorted_clusters[pos], MISSING)
+
+
+def lookup_clusters(node_ids, nodes, clusters):
+    """ Cluster id of every entry of node_ids under one membership, MISSING if absent """
+    return _search(node_ids, *_sorted_lookup(nodes, clusters))
+
+
+class ClusterEdgeCounter:
+    """ Intra/inter edge counts for one partition, accumulated over edge chunks
+
+    As in count_inter_cluster6.py, an edge is intra-cluster when both
+    endpoints have the same cluster id (two MISSING endpoints compare equal),
+    which is what the totals report. Per-cluster counts only cover edges with
+    both endpoints assigned; an inter-cluster edge counts once for each of
+    its two clusters. Counts are exact integers, so any chunking gives the
+    same result as one pass over the whole edge list.
+    """
+
+    def __init__(self, nodes, clusters):
+        self.sorted_nodes, self.sorted_clusters = _sorted_lookup(nodes, clusters)
+        self.cluster_ids, self.nodes_in_cluster = np.unique(clusters, return_counts=True)
+        n_clusters = len(self.cluster_ids)
+        self.total = 0
+        self.intra = 0
+        self.intra_per_cluster = np.zeros(n_clusters, dtype=np.int64)
+        self.inter_per_cluster = np.zeros(n_clusters, dtype=np.int64)
+        self.endpoints_per_cluster = np.zeros(n_clusters, dtype=np.int64)
+
+    def lookup(self, node_ids):
+        return _search(node_ids, self.sorted_nodes, self.sorted_clusters)
+
+    def add(self, cu, cv):
+        """ Count a chunk of edges given the cluster of each endpoint """
+        same = cu == cv
+        self.total += len(cu)
+        self.intra += int(np.count_nonzero(same))
+
+        assigned = (cu != MISSING) & (cv != MISSING)
+        code_u = np.searchsorted(self.cluster_ids, cu[assigned])
+        code_v = np.searchsorted(self.cluster_ids, cv[assigned])
+        same = same[assigned]
+
+        n_clusters = len(self.cluster_ids)
+        self.intra_per_cluster += np.bincount(code_u[same], minlength=n_clusters)
+        self.inter_per_cluster += (np.bincount(code_u[~same], minlength=n_clusters)
+                                   + np.bincount(code_v[~same], minlength=n_clusters))
+        self.endpoints_per_cluster += (np.bincount(code_u, minlength=n_clusters)
+                                       + np.bincount(code_v, minlength=n_clusters))
+
+    def add_edges(self, u, v):
+        """ Count a chunk of edges given in original node ids """
+        self.add(self.lookup(u), self.lookup(v))
+
+    def result(self):
+        """ Totals plus per-cluster counts for clusters touched by an assigned edge """
+        seen = self.endpoints_per_cluster > 0
+        return {
+            'total': self.total,
+            'intra': self.intra,
+            'inter': self.total - self.intra,
+            'cluster_ids': self.cluster_ids[seen],
+            'intra_per_cluster': self.intra_per_cluster[seen],
+            'inter_per_cluster': self.inter_per_cluster[seen],
+        }
+
+    def table(self):
+        """ nodes_in_cluster / intra_cluster_edges / inter_cluster_edges for every cluster, by cluster_id """
+        return pd.DataFrame({
+            'cluster_id': self.cluster_ids,
+            'nodes_in_cluster': self.nodes_in_cluster,
+            'intra_cluster_edges': self.intra_per_cluster,
+            'inter_cluster_edges': self.inter_per_cluster,
+        })
+
+
+def _add_chunk(counters, u, v):
+    """ Feed one edge chunk to every partition's counter """
+    # Reduce the chunk to its distinct nodes once; each partition then only
+    # looks those up and gathers the result for both endpoint arrays
+    node_ids, inverse = np.unique(np.concatenate([u, v]), return_inverse=True)
+    iu, iv = inverse[:len(u)], inverse[len(u):]
+    for counter in counters.values():
+        node_cluster = counter.lookup(node_ids)
+        counter.add(node_cluster[iu], node_cluster[iv])
+
+
+def classify_edges(u, v, partitions):
+    """ Classify every edge as intra- or inter-cluster under each partition
+
+    partitions maps a label (e.g. '0.01') to a (nodes, clusters) pair as
+    returned by load_membership. Returns {label: ClusterEdgeCounter.result()}.
+    """
+    counters = {label: ClusterEdgeCounter(nodes, clusters) for label, (nodes, clusters) in partitions.items()}
+    _add_chunk(counters, u, v)
+    return {label: counter.result() for label, counter in counters.items()}
+
+
+def stream_classify_edges(edge_file, partitions, chunksize=DEFAULT_CHUNKSIZE):
+    """ classify_edges over an edge file read chunksize edges at a time
+
+    Peak memory is bounded by the chunk size plus the memberships, and the
+    result is identical to loading the whole edge list.
+    """
+    counters = {label: ClusterEdgeCounter(nodes, clusters) for label, (nodes, clusters) in partitions.items()}
+    for u, v in iter_edge_chunks(edge_file, chunksize):
+        _add_chunk(counters, u, v)
+    return {label: counter.result() for label, counter in counters.items()}
+
+
+def cluster_edge_table(u, v, nodes, clusters):
+    """ Per-cluster nodes_in_cluster, intra_cluster_edges and inter_cluster_edges
+
+    Columnar replacement for the iterrows loop in the summary_cluster_edges
+    scripts: only edges with both endpoints in the membership are counted,
+    and nodes_in_cluster is the number of membership rows per cluster.
+    Rows are sorted by cluster_id.
+    """
+    counter = ClusterEdgeCounter(nodes, clusters)
+    counter.add_edges(u, v)
+    return counter.table()
+
+
+def stream_cluster_edge_table(edge_chunks, nodes, clusters):
+    """ cluster_edge_table accumulated over an iterable of (u, v) edge chunks """
+    counter = ClusterEdgeCounter(nodes, clusters)
+    for u, v in edge_chunks:
+        counter.add_edges(u, v)
+    return counter.table()
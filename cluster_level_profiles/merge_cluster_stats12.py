@@ -0,0 +1,97 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import pandas as pd
+
+# Shared modules live at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from resolutions import find_file, keys, selected_keys
+
+# Same merge as merge_cluster_stats11.py - every stats column joined onto the
+# intercluster edge table by cluster id - but each file is read once, its
+# layout is taken from the first three lines only, the join is on integer
+# cluster ids, and the resolutions are merged in parallel.
+
+# Directories (update paths as needed)
+input_csv_dir = 'intercluster_outputs'
+stats_dir = 'output_files/former_without_intercluster'
+output_dir = 'new_aggregate_w_intercluster'
+
+def get_separator(file_name):
+    if file_name.endswith('.csv'):
+        return ','
+    elif file_name.endswith('.tsv'):
+        return '\t'
+    else:
+        return None
+
+def header_rows(path, sep):
+    """ 3 for the cluster_stats (column, statistic, Cluster_ID) header, else 1 """
+    with open(path) as f:
+        head = list(islice(f, 3))
+    if len(head) == 3 and head[2].split(sep)[0].strip().lower() == 'cluster_id':
+        return 3
+    return 1
+
+def read_cluster_table(path, as_text=False):
+    """ Cluster table with lower-case column names and an integer 'cluster_id' first column
+
+    as_text keeps every other column as the strings in the file, so values are
+    written back exactly as they were read.
+    """
+    sep = get_separator(path)
+    df = pd.read_csv(path, sep=sep, header=0, skiprows=range(1, header_rows(path, sep)),
+                     dtype=str if as_text else None)
+    df.columns = ['cluster_id'] + df.columns[1:].str.strip().str.lower().tolist()
+    df['cluster_id'] = pd.to_numeric(df['cluster_id']).astype('int64')
+    return df
+
+def merge_key(job):
+    """ Merge one resolution's intercluster and stats tables and write <input name>.csv """
+    key, input_path, stats_path, out_dir = job
+    df_input = read_cluster_table(input_path)
+    # Drop old count columns if they exist (node_count, edge_count)
+    df_input = df_input.drop(columns=[col for col in ['node_count', 'edge_count'] if col in df_input.columns])
+    df_stats = read_cluster_table(stats_path, as_text=True)
+
+    df_merged = df_input.merge(df_stats, on='cluster_id', how='left')
+
+    output_filename = os.path.splitext(os.path.basename(input_path))[0] + '.csv'
+    output_path = os.path.join(out_dir, output_filename)
+    df_merged.to_csv(output_path, sep=',', index=False)
+    return key, output_path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Join per-cluster stats onto the intercluster edge tables.')
+    parser.add_argument('-i', metavar='input_dir', type=str, default=input_csv_dir)
+    parser.add_argument('-s', metavar='stats_dir', type=str, default=stats_dir)
+    parser.add_argument('-o', metavar='output_dir', type=str, default=output_dir)
+    parser.add_argument('-k', metavar='key', type=str, nargs='+', default=None,
+                        help='resolution keys (default: the fixed list)')
+    parser.add_argument(
+        '-R', metavar='resolutions_file', type=str, default=None,
+        help='keys from resolution_profile.py output, followed by any -k keys'
+        )
+    parser.add_argument(
+        '-w', metavar='workers', type=int, default=len(keys),
+        help='resolutions merged in parallel'
+        )
+    args = parser.parse_args()
+    args.k = selected_keys(args.R, args.k)
+
+    os.makedirs(args.o, exist_ok=True)
+    input_names, stats_names = os.listdir(args.i), os.listdir(args.s)
+    jobs = []
+    for key in args.k:
+        input_file, stats_file = find_file(input_names, key), find_file(stats_names, key)
+        if not input_file or not stats_file:
+            print(f"[{key}] Missing input or stats file.")
+            continue
+        jobs.append((key, os.path.join(args.i, input_file), os.path.join(args.s, stats_file), args.o))
+
+    with ProcessPoolExecutor(max_workers=args.w) as pool:
+        for key, output_path in pool.map(merge_key, jobs):
+            print(f"[{key}] Merged and saved to {output_path}")
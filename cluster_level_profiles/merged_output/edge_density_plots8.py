@@ -0,0 +1,206 @@
+import argparse
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_pdf import PdfPages
+from scipy.stats import rankdata
+
+# Shared kernels live at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from resolutions import keys, read_resolutions, resolution_key
+
+# Same pages as edge_density_plots7.py, but the directory is listed once,
+# every resolution's table is read once (edge_density and the target columns
+# only), and all Spearman rhos come from one rank pass per table before any
+# page is drawn. With -w > 1 the pages are drawn in parallel, one PDF each.
+
+# === CONFIGURATION ===
+input_dir = "."  # 🔁 Replace this
+target_columns = [
+    "cp_r_citing_zero_y", "cp_r_citing_nonzero_y",
+    "cp_r_cited_zero_y", "cp_r_cited_nonzero_y",
+    "tr_citing_y", "tr_cited_y"
+]
+pdf_name = "scatter_edge_density_correlations.pdf"
+
+# === CUSTOM COLORS ===
+special_color = '#ff1493'  # hot pink for 'modularity'
+background_key = '0.2'
+gray_key = '0.1'
+yellow_key = '0.01'
+black_key = '0.05'
+
+def keys_ordered(keys=keys):
+    """ Plot order: the background resolution first so it is drawn underneath """
+    return [k for k in keys if k == background_key] + [k for k in keys if k != background_key]
+
+def key_styles(keys=keys):
+    """ {key: (color, alpha, zorder, size)} as edge_density_plots7.py assigns them """
+    color_cycle = plt.rcParams['axes.prop_cycle'].by_key()['color']
+    fixed = {'modularity': special_color, gray_key: 'gray', yellow_key: 'yellow', black_key: 'black'}
+    styles = {}
+    color_index = 0
+    for key in keys_ordered(keys):
+        # === COLOR LOGIC ===
+        if key in fixed:
+            color = fixed[key]
+        else:
+            color = color_cycle[color_index % len(color_cycle)]
+            color_index += 1
+        # === STYLING ===
+        if key == background_key:
+            styles[key] = (color, 0.3, 0, 15)
+        elif key == gray_key:
+            styles[key] = (color, 0.4, 1, 25)
+        elif key == black_key:
+            styles[key] = (color, 0.8, 2, 25)
+        else:
+            styles[key] = (color, 0.6, 3, 25)
+    return styles
+
+def load_tables(directory, keys=keys, columns=target_columns):
+    """ [(key, file name, DataFrame)] in plot order, each with 'edge_density' and the target columns as floats
+
+    edge_density is taken by name, falling back to the last column as
+    edge_density_plots7.py did.
+    """
+    names = sorted(f for f in os.listdir(directory) if f.endswith(".csv"))
+    tables = []
+    for key in keys_ordered(keys):
+        for fname in names:
+            if resolution_key(fname, [key]) is None:
+                continue
+            path = os.path.join(directory, fname)
+            header = pd.read_csv(path, nrows=0).columns
+            density_col = 'edge_density' if 'edge_density' in header else header[-1]
+            missing = [c for c in columns if c not in header]
+            if missing:
+                print(f"[{key}] {fname} has no column {missing}, skipping.")
+                continue
+            df = pd.read_csv(path, usecols=list(dict.fromkeys([density_col] + columns)))
+            df = df.apply(pd.to_numeric, errors='coerce').astype(np.float64)
+            tables.append((key, fname, df.rename(columns={density_col: 'edge_density'})))
+    return tables
+
+def _pearson(rx, RY):
+    """ Pearson correlation of vector rx with every column of RY """
+    rx = rx - rx.mean()
+    RY = RY - RY.mean(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (rx @ RY) / (np.sqrt(rx @ rx) * np.sqrt((RY * RY).sum(axis=0)))
+
+def spearman_columns(x, Y):
+    """ Spearman rho of x with every column of Y, each over the rows where both are present
+
+    Columns sharing the same missing-value pattern are ranked together in one
+    rankdata call; rho is NaN for fewer than 2 rows or a constant side.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    Y = np.asarray(Y, dtype=np.float64)
+    valid = ~np.isnan(x)[:, None] & ~np.isnan(Y)
+    rho = np.full(Y.shape[1], np.nan)
+    # Group columns by their valid-row mask (usually a single group)
+    masks, group = np.unique(valid.T, axis=0, return_inverse=True)
+    for g, mask in enumerate(masks):
+        cols = np.flatnonzero(group.ravel() == g)
+        if mask.sum() < 2:
+            continue
+        ranks = rankdata(np.column_stack([x[mask], Y[mask][:, cols]]), axis=0)
+        rho[cols] = _pearson(ranks[:, 0], ranks[:, 1:])
+    return rho
+
+def correlations(tables, columns=target_columns):
+    """ (key, file name) x target column DataFrame of Spearman rho with edge_density """
+    rho = [spearman_columns(df['edge_density'], df[columns]) for _, _, df in tables]
+    index = pd.MultiIndex.from_tuples([(key, fname) for key, fname, _ in tables], names=['key', 'file'])
+    return pd.DataFrame(np.array(rho).reshape(len(tables), len(columns)), index=index, columns=columns)
+
+def draw_page(target_col, tables, rho, styles):
+    """ One scatter page; returns the figure """
+    fig = plt.figure(figsize=(8, 6))
+    all_rho = []
+    for key, fname, df in tables:
+        pair = df[['edge_density', target_col]].dropna()
+        if pair.empty:
+            continue
+        color, alpha, zorder, size = styles[key]
+        plt.scatter(pair['edge_density'], pair[target_col], label=key,
+                    alpha=alpha, s=size, color=color, zorder=zorder)
+        all_rho.append((key, rho.loc[(key, fname), target_col]))
+
+    # === PLOT SETTINGS ===
+    plt.xscale('log')
+    plt.yscale('log')
+    plt.xlabel("Edge Density (log)")
+    plt.ylabel(f"{target_col} (log)")
+    plt.title(f"Edge Density vs {target_col}")
+    plt.grid(True, which='both', linestyle='--', linewidth=0.5)
+    plt.legend(title="Key", fontsize=8)
+
+    if all_rho:
+        cor_text = "\n".join([f"{k}: ρ = {r:.2f}" for k, r in all_rho if pd.notna(r)])
+        plt.annotate(cor_text, xy=(0.05, 0.95), xycoords='axes fraction',
+                     ha='left', va='top', fontsize=9,
+                     bbox=dict(boxstyle="round", fc="w", ec="0.5"))
+    plt.tight_layout()
+    return fig
+
+# Tables, rhos and styles shared with forked page workers
+_cache = None
+
+def _render_page_file(job):
+    """ Worker: draw one page into its own PDF """
+    target_col, path = job
+    tables, rho, styles = _cache
+    fig = draw_page(target_col, tables, rho, styles)
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+def render(tables, rho, out_dir, columns=target_columns, workers=1, keys=keys):
+    """ All pages into one PDF, or with workers > 1 one PDF per target column drawn in parallel """
+    global _cache
+    styles = key_styles(keys)
+    if workers <= 1:
+        pdf_path = os.path.join(out_dir, pdf_name)
+        with PdfPages(pdf_path) as pdf:
+            for target_col in columns:
+                fig = draw_page(target_col, tables, rho, styles)
+                pdf.savefig(fig)
+                plt.close(fig)
+        return [pdf_path]
+
+    _cache = (tables, rho, styles)
+    stem = os.path.splitext(pdf_name)[0]
+    jobs = [(col, os.path.join(out_dir, f"{stem}_{col}.pdf")) for col in columns]
+    # Forked workers see the loaded tables without pickling them
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as pool:
+        return list(pool.map(_render_page_file, jobs))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Edge density vs BDID scatter pages with Spearman rho.')
+    parser.add_argument('-i', metavar='input_dir', type=str, default=input_dir)
+    parser.add_argument('-o', metavar='output_dir', type=str, default=None,
+                        help='default: <input_dir>/scatter_plots')
+    parser.add_argument('-w', metavar='workers', type=int, default=1,
+                        help='pages drawn in parallel, one PDF per page (default 1: one multi-page PDF)')
+    parser.add_argument('-R', metavar='resolutions_file', type=str, default=None,
+                        help='resolution keys from resolution_profile.py instead of the fixed list')
+    args = parser.parse_args()
+    plot_keys = read_resolutions(args.R) if args.R else keys
+
+    output_dir = args.o or os.path.join(args.i, "scatter_plots")
+    os.makedirs(output_dir, exist_ok=True)
+
+    tables = load_tables(args.i, plot_keys)
+    rho = correlations(tables)
+    rho.to_csv(os.path.join(output_dir, "spearman_edge_density.csv"))
+    paths = render(tables, rho, output_dir, workers=args.w, keys=plot_keys)
+    print(f"\n✅ Plots saved with black for '.05' at:\n" + "\n".join(paths))
@@ -0,0 +1,122 @@
+import argparse
+import os
+import sys
+
+# Shared kernels live at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from cluster_cube import build_cube, load_cube
+from columnar_io import read_table
+from manifest import Manifest
+from resolutions import resolution_key, selected_keys
+
+# One pass over every resolution's node table: count, sum, min, max, mean
+# (optionally variance and quantiles) of all columns per Cluster_ID, stored
+# as an on-disk cluster x statistic x resolution cube. The per-file
+# <file>_aggregated.csv tables of cluster_stats3.py are still written from it.
+
+# Define the directory containing your CSV files
+input_directory = '.'  # Replace with your input directory
+cube_directory = 'cluster_cube'
+legacy_directory = '.'  # where the <file>_aggregated.csv tables go
+
+# List of columns we are interested in
+columns_of_interest = [
+    'cp_level_x', 'cp_r_citing_zero_x', 'cp_r_citing_nonzero_x', 'tr_citing_x',
+    'cp_r_cited_zero_x', 'cp_r_cited_nonzero_x', 'tr_cited_x',
+    'cp_level_y', 'cp_r_citing_zero_y', 'cp_r_citing_nonzero_y', 'tr_citing_y',
+    'cp_r_cited_zero_y', 'cp_r_cited_nonzero_y', 'tr_cited_y',
+    'network_degree', 'network_indegree', 'network_outdegree',
+    'cluster_degree', 'cluster_indegree', 'cluster_outdegree'
+]
+
+def node_tables(directory, reuse=lambda filename: False, keys=None):
+    """ {filename: DataFrame} of the node tables that have Cluster_ID and every column of interest
+
+    Files for which reuse(filename) is true are not read and map to None.
+    With keys, only the tables of those resolutions are read.
+    """
+    tables = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(('.csv', '.parquet')) or '_aggregated' in filename:
+            continue
+        if keys is not None and not resolution_key(filename, keys):
+            continue
+        if reuse(filename):
+            tables[filename] = None
+            continue
+        file_path = os.path.join(directory, filename)
+        try:
+            df = read_table(file_path, columns=['Cluster_ID'] + columns_of_interest)
+        except (ValueError, KeyError):
+            print(f"Required columns missing in {filename}. Skipping this file.")
+            continue
+        tables[filename] = df
+    return tables
+
+def legacy_aggregate(cube, filename):
+    """ The cluster_stats3.py table for one file: mean/sum/min/max per column, node_count, edge_count """
+    stats = cube.get(filename, columns_of_interest, ['mean', 'sum', 'min', 'max'])
+    # The node tables carry Node_ID, not node_id, so cluster_stats3.py left node_count empty
+    stats['node_count'] = None
+    # For each cluster, sum the cluster_degree and divide by 2 to get the number of edges
+    stats['edge_count'] = stats[('cluster_degree', 'sum')] / 2
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Per-cluster statistics cube for all node tables.')
+    parser.add_argument('-i', metavar='input_dir', type=str, default=input_directory)
+    parser.add_argument('-o', metavar='cube_dir', type=str, default=cube_directory)
+    parser.add_argument('--variance', action='store_true', help='also store the variance (ddof=1)')
+    parser.add_argument(
+        '--quantiles', type=float, nargs='*', default=[],
+        help='also store these quantiles, e.g. 0.25 0.5 0.75'
+        )
+    parser.add_argument('--no-legacy', action='store_true', help='do not write <file>_aggregated.csv')
+    parser.add_argument('-s', metavar='stats_dir', type=str, default=legacy_directory,
+                        help='directory for the <file>_aggregated.csv tables (default: the current one)')
+    parser.add_argument(
+        '-m', metavar='manifest', type=str, default=None,
+        help='content-hash manifest; unchanged node tables keep their rows from the existing cube'
+        )
+    parser.add_argument(
+        '-k', metavar='key', type=str, nargs='+', default=None,
+        help='only the node tables of these resolutions (default: every table)'
+        )
+    parser.add_argument(
+        '-R', metavar='resolutions_file', type=str, default=None,
+        help='only the resolutions in this resolution_profile.py output, and any -k keys'
+        )
+    args = parser.parse_args()
+    keys = selected_keys(args.R, args.k) if args.R or args.k else None
+
+    params = {'columns': columns_of_interest, 'variance': args.variance, 'quantiles': args.quantiles}
+    legacy_outputs = lambda filename: [] if args.no_legacy else [os.path.join(args.s, f"{filename}_aggregated.csv")]
+    manifest = Manifest(args.m) if args.m else None
+    previous = None
+    if manifest and os.path.exists(os.path.join(args.o, 'meta.json')):
+        previous = load_cube(args.o)
+
+    def reuse(filename):
+        return (previous is not None and filename in previous.labels
+                and manifest.is_current('cluster_stats', filename, [os.path.join(args.i, filename)],
+                                        legacy_outputs(filename), params))
+
+    tables = node_tables(args.i, reuse, keys)
+    cube = build_cube(tables, 'Cluster_ID', columns_of_interest,
+                      variance=args.variance, quantiles=args.quantiles, previous=previous)
+    cube.save(args.o)
+    print(f"Saved {len(cube.cluster_ids)} clusters x {len(cube.columns)} columns x "
+          f"{len(cube.stats)} statistics ({', '.join(cube.stats)}) for {len(cube.labels)} files to {args.o}")
+
+    for filename, df in tables.items():
+        if df is None:
+            print(f"{filename} unchanged, reused its cube rows")
+            continue
+        if not args.no_legacy:
+            os.makedirs(args.s, exist_ok=True)
+            output_file = os.path.join(args.s, f"{filename}_aggregated.csv")
+            legacy_aggregate(cube, filename).to_csv(output_file)
+            print(f"Saved aggregated stats for {filename} to {output_file}")
+        if manifest:
+            manifest.record('cluster_stats', filename, [os.path.join(args.i, filename)],
+                            legacy_outputs(filename), params)
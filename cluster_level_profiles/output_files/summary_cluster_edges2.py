@@ -1,16 +1,19 @@
 
 
 import os
+import sys
 import pandas as pd
-from collections import defaultdict
+
+# Shared edge-counting kernel lives at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from cluster_edges import cluster_edge_table
+from resolutions import keys
 
 cluster_dir = "clusters/"
 edge_dir = "cluster_edges_remaining/"
 output_dir = "path/"  # Directory to save results
 os.makedirs(output_dir, exist_ok=True)
 
-keys = ['0.001', '0.005', '0.01', '0.05', '0.1', '0.2', 'modularity']
-
 def read_file(filepath):
     ext = os.path.splitext(filepath)[1]
     if ext == ".csv":
@@ -22,30 +25,19 @@ def read_file(filepath):
 
 def load_clusters(cluster_file):
     df = read_file(cluster_file)
-    df.columns = df.columns[:2]  # Only first two columns
+    df = df.iloc[:, :2]  # Only first two columns
     df.columns = ['node', 'cluster']
-    cluster_map = dict(zip(df['node'], df['cluster']))
-
-    # Count number of nodes in each cluster
-    node_counts = df['cluster'].value_counts().to_dict()
-    
-    return cluster_map, node_counts
+    return df
 
-def count_edges_per_cluster(edge_file, cluster_map):
+def count_edges_per_cluster(edge_file, clusters_df):
     df = read_file(edge_file)
-    df.columns = df.columns[:2]
+    df = df.iloc[:, :2]
     df.columns = ['u', 'v']
-    
-    edge_counts = defaultdict(int)
 
-    for _, row in df.iterrows():
-        u, v = row['u'], row['v']
-        if u in cluster_map and v in cluster_map:
-            cu, cv = cluster_map[u], cluster_map[v]
-            if cu == cv:
-                edge_counts[cu] += 1
-
-    return edge_counts
+    # Node and intracluster edge counts per cluster from one columnar pass
+    table = cluster_edge_table(df['u'].to_numpy(), df['v'].to_numpy(),
+                               clusters_df['node'].to_numpy(), clusters_df['cluster'].to_numpy())
+    return table[['cluster_id', 'nodes_in_cluster', 'intra_cluster_edges']]
 
 # Main loop
 for key in keys:
@@ -59,20 +51,9 @@ for key in keys:
     cluster_file_path = os.path.join(cluster_dir, cluster_files[0])
     edge_file_path = os.path.join(edge_dir, edge_files[0])
 
-    cluster_map, node_counts = load_clusters(cluster_file_path)
-    edge_counts = count_edges_per_cluster(edge_file_path, cluster_map)
-
-    # Merge cluster stats
-    all_cluster_ids = set(node_counts.keys()) | set(edge_counts.keys())
-    data = []
-    for cid in sorted(all_cluster_ids):
-        data.append({
-            'cluster_id': cid,
-            'nodes_in_cluster': node_counts.get(cid, 0),
-            'intra_cluster_edges': edge_counts.get(cid, 0)
-        })
+    clusters_df = load_clusters(cluster_file_path)
+    df_output = count_edges_per_cluster(edge_file_path, clusters_df)
 
-    df_output = pd.DataFrame(data)
     output_path = os.path.join(output_dir, f"{key}_cluster_stats.csv")
     df_output.to_csv(output_path, index=False)
 
@@ -0,0 +1,100 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# BDID kernels live at the repository root
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+sys.path.insert(0, root)
+from bdid import BDID_COLUMNS, cluster_bdid, node_table
+from cluster_edges import MISSING, load_membership, lookup_clusters
+from graph_store import load_graph
+
+# Regression test for bdid.node_table, the output_*.csv node tables that
+# cluster_stats4.py, expanded_merged_node2.py and the merge scripts read. The
+# tables must keep the conventions of the legacy output/output_0.01.csv (a
+# slice of it is read): the same columns in the same order, no rows for
+# unclustered nodes, and _y statistics that are NaN as a whole for nodes the
+# clustered BDID does not score. The edges are the dirty fixture sample, so
+# duplicate edges and self-loops are exercised too.
+#
+# Usage: pytest test_bdid_output.py
+
+fixture_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+edge_file = os.path.join(fixture_dir, 'cit_hepph_dirty_sample_edges.tsv')
+cluster_file = os.path.join(root, 'cit_hepph_cpm_0.01.tsv')
+legacy_file = os.path.join(root, 'output', 'output_0.01.csv')
+legacy_rows = 5000
+
+Y_COLUMNS = [f"{col}_y" for col in BDID_COLUMNS]
+
+
+def read_inputs():
+    """ (graph, node_cluster, legacy slice); missing fixtures are an error, not a skip """
+    for path in (edge_file, cluster_file, legacy_file):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"test input {path} is missing")
+    graph = load_graph(edge_file)
+    node_cluster = lookup_clusters(np.asarray(graph.node_ids), *load_membership(cluster_file))
+    return graph, node_cluster, pd.read_csv(legacy_file, nrows=legacy_rows)
+
+
+def test_columns_match_legacy():
+    graph, node_cluster, legacy = read_inputs()
+    assert list(node_table(graph, node_cluster).columns) == list(legacy.columns)
+
+
+def test_unclustered_nodes_have_no_row():
+    graph, node_cluster, legacy = read_inputs()
+    table = node_table(graph, node_cluster)
+    assert legacy['Cluster_ID'].notna().all()
+    assert (node_cluster == MISSING).any()
+    assert (table['Cluster_ID'] != MISSING).all()
+    assert set(table['Node_ID']) == set(np.asarray(graph.node_ids)[node_cluster != MISSING])
+
+
+def test_cluster_ids_match_legacy():
+    graph, node_cluster, legacy = read_inputs()
+    merged = node_table(graph, node_cluster).merge(legacy, on='Node_ID', suffixes=('', '_legacy'))
+    assert len(merged) > 0
+    assert (merged['Cluster_ID'] == merged['Cluster_ID_legacy']).all()
+
+
+def test_unscored_nodes_have_nan_y():
+    graph, node_cluster, legacy = read_inputs()
+    # legacy: the _y statistics are missing all together or not at all
+    legacy_nan = legacy[Y_COLUMNS].isna()
+    assert legacy_nan.any(axis=None)
+    assert (legacy_nan.all(axis=1) == legacy_nan.any(axis=1)).all()
+
+    table = node_table(graph, node_cluster)
+    nan = table[Y_COLUMNS].isna()
+    unscored = table['cluster_degree'] == 0
+    assert unscored.any() and (~unscored).any()
+    assert (nan.all(axis=1) == unscored).all()
+    assert (nan.any(axis=1) == unscored).all()
+
+
+def test_scored_values_match_cluster_bdid():
+    graph, node_cluster, _ = read_inputs()
+    table = node_table(graph, node_cluster).set_index('Node_ID')
+    expected = cluster_bdid(graph, node_cluster).set_index('fp_int_id')
+    scored = table.index[table['cluster_degree'] > 0]
+    for col in BDID_COLUMNS:
+        assert (table.loc[scored, f"{col}_y"] == expected.loc[scored, col]).all()
+
+
+def test_degrees_count_distinct_edges():
+    graph, node_cluster, _ = read_inputs()
+    edges = pd.read_csv(edge_file, sep='\t', header=None, names=['u', 'v'])
+    assert edges.duplicated().any()
+    distinct = edges.drop_duplicates()
+    table = node_table(graph, node_cluster).set_index('Node_ID')
+
+    indegree = distinct['v'].value_counts().reindex(table.index, fill_value=0)
+    outdegree = distinct['u'].value_counts().reindex(table.index, fill_value=0)
+    assert (table['network_indegree'] == indegree).all()
+    assert (table['network_outdegree'] == outdegree).all()
+    assert (table['cluster_indegree'] <= table['network_indegree']).all()
+    assert (table['cluster_outdegree'] <= table['network_outdegree']).all()
@@ -0,0 +1,98 @@
+import os
+import sys
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+# Shared edge-counting kernel lives at the repository root
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+sys.path.insert(0, root)
+from cluster_edges import cluster_edge_table, stream_cluster_edge_table
+
+# Regression test for the columnar count_edges_per_cluster used by
+# summary_cluster_edges3_w_intercluster6.py and summary_cluster_edges2.py:
+# the intra + inter table must equal what the original iterrows loop produced
+# on checked-in inputs - the repo's cit_hepph_cpm_0.01.tsv and a deliberately
+# dirty 1201-edge cit-HepPh sample. The sample is not cleaned: besides
+# ordinary edges it has edges to unclustered ids (9999900-9999911),
+# 13 duplicate edges and 8 self-loops, all of which the kernels must count
+# the way the iterrows loop did.
+#
+# Usage: pytest test_cluster_stats.py
+
+fixture_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+edge_file = os.path.join(fixture_dir, 'cit_hepph_dirty_sample_edges.tsv')
+cluster_file = os.path.join(root, 'cit_hepph_cpm_0.01.tsv')
+
+COLUMNS = ['cluster_id', 'nodes_in_cluster', 'intra_cluster_edges', 'inter_cluster_edges']
+
+
+def read_inputs():
+    """ (edges, clusters) DataFrames; missing fixtures are an error, not a skip """
+    for path in (edge_file, cluster_file):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"test input {path} is missing")
+    edges = pd.read_csv(edge_file, sep='\t', header=None, names=['u', 'v'])
+    clusters = pd.read_csv(cluster_file, sep='\t', header=None, names=['node', 'cluster'])
+    return edges, clusters
+
+
+def baseline_table(edges, clusters):
+    """ The original load_clusters / iterrows count_edges_per_cluster / merge loop """
+    cluster_map = clusters.set_index('node')['cluster'].to_dict()
+    node_counts = clusters['cluster'].value_counts().to_dict()
+
+    edge_counts_intra = defaultdict(int)
+    edge_counts_inter = defaultdict(int)
+    for _, row in edges.iterrows():
+        u, v = row['u'], row['v']
+        if u in cluster_map and v in cluster_map:
+            cu, cv = cluster_map[u], cluster_map[v]
+            if cu == cv:
+                edge_counts_intra[cu] += 1
+            else:
+                edge_counts_inter[cu] += 1
+                edge_counts_inter[cv] += 1
+
+    all_cluster_ids = set(node_counts.keys()) | set(edge_counts_intra.keys()) | set(edge_counts_inter.keys())
+    data = []
+    for cid in sorted(all_cluster_ids):
+        data.append({
+            'cluster_id': cid,
+            'nodes_in_cluster': node_counts.get(cid, 0),
+            'intra_cluster_edges': edge_counts_intra.get(cid, 0),
+            'inter_cluster_edges': edge_counts_inter.get(cid, 0)
+        })
+    return pd.DataFrame(data)
+
+
+def assert_same_counts(actual, expected):
+    pd.testing.assert_frame_equal(actual[COLUMNS].reset_index(drop=True).astype(np.int64),
+                                  expected[COLUMNS].astype(np.int64))
+
+
+def test_fixture_exercises_every_case():
+    edges, clusters = read_inputs()
+    expected = baseline_table(edges, clusters)
+    assert expected['intra_cluster_edges'].sum() > 0
+    assert expected['inter_cluster_edges'].sum() > 0
+    assert (~edges['u'].isin(clusters['node'])).any()
+    assert edges.duplicated().any()
+    assert (edges['u'] == edges['v']).any()
+
+
+def test_cluster_edge_table_matches_iterrows():
+    edges, clusters = read_inputs()
+    actual = cluster_edge_table(edges['u'].to_numpy(), edges['v'].to_numpy(),
+                                clusters['node'].to_numpy(), clusters['cluster'].to_numpy())
+    assert_same_counts(actual, baseline_table(edges, clusters))
+
+
+def test_streamed_table_matches_iterrows():
+    edges, clusters = read_inputs()
+    u, v = edges['u'].to_numpy(), edges['v'].to_numpy()
+    chunks = ((u[i:i + 97], v[i:i + 97]) for i in range(0, len(u), 97))
+    actual = stream_cluster_edge_table(chunks, clusters['node'].to_numpy(), clusters['cluster'].to_numpy())
+    assert_same_counts(actual, baseline_table(edges, clusters))
+
@@ -0,0 +1,133 @@
+# Per-cluster quality metrics from the node/edge counts of every resolution.
+#
+# For a cluster with n nodes, m intra-cluster edges and c inter-cluster edges
+# (edges with exactly one endpoint in it), in a graph of M edges:
+#   edge_density     m / (n (n - 1) / 2), 0 when n is below 2 or missing (as edge_density.py)
+#   conductance      c / min(vol, 2M - vol), vol = 2m + c
+#   normalized_cut   c / vol + c / (2M - vol)
+#   expansion        c / n
+#   intra_inter_ratio m / c (inf for a cluster with no inter-cluster edges)
+# M defaults to sum(m) + sum(c) / 2, which is the graph's edge count when
+# every node is clustered. Tables without an inter-cluster column get NaN
+# for the cut-based metrics.
+#
+# Writes one new table (cluster_quality.csv by default) with a resolution
+# column; the input tables are never modified.
+#
+# Usage: python cluster_quality.py -o cluster_quality.csv new_aggregate_w_intercluster/*.csv
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from columnar_io import read_table, write_table
+from resolutions import find_file, keys, resolution_key, selected_keys
+
+# Accepted names for each count, in order of preference: cluster_edges.py
+# tables first, then the merged new_aggregate_w_intercluster tables
+COUNT_COLUMNS = {
+    'cluster_id': ['cluster_id', 'Cluster_ID'],
+    'nodes_in_cluster': ['nodes_in_cluster', 'node_count'],
+    'intra_cluster_edges': ['intra_cluster_edges', 'edge_count'],
+    'inter_cluster_edges': ['inter_cluster_edges', 'intercluster_edges'],
+}
+METRIC_COLUMNS = ['edge_density', 'conductance', 'normalized_cut', 'expansion', 'intra_inter_ratio']
+
+
+def find_column(df, name):
+    """ The column of df holding count `name`, or None """
+    return next((c for c in COUNT_COLUMNS[name] if c in df.columns), None)
+
+
+def quality_metrics(df, n_edges=None):
+    """ cluster_id, the three counts and METRIC_COLUMNS for one resolution's cluster table """
+    columns = {name: find_column(df, name) for name in COUNT_COLUMNS}
+    missing = [name for name in ('cluster_id', 'nodes_in_cluster', 'intra_cluster_edges') if columns[name] is None]
+    if missing:
+        raise KeyError(f"no column for {missing}; have {list(df.columns)}")
+
+    n = df[columns['nodes_in_cluster']].to_numpy(dtype=np.float64)
+    m = df[columns['intra_cluster_edges']].to_numpy(dtype=np.float64)
+    if columns['inter_cluster_edges']:
+        c = df[columns['inter_cluster_edges']].to_numpy(dtype=np.float64)
+    else:
+        c = np.full(len(df), np.nan)
+    if n_edges is None:
+        n_edges = np.nansum(m) + np.nansum(c) / 2
+
+    volume = 2 * m + c
+    rest = 2 * n_edges - volume
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # NaN sizes compare False, so they get 0 like clusters of one node
+        density = np.where(n > 1, m / (n * (n - 1) / 2), 0.0)
+        conductance = c / np.minimum(volume, rest)
+        normalized_cut = c / volume + c / rest
+        expansion = c / n
+        ratio = m / c
+
+    return pd.DataFrame({
+        'cluster_id': df[columns['cluster_id']].to_numpy(),
+        'nodes_in_cluster': df[columns['nodes_in_cluster']].to_numpy(),
+        'intra_cluster_edges': df[columns['intra_cluster_edges']].to_numpy(),
+        'inter_cluster_edges': df[columns['inter_cluster_edges']].to_numpy() if columns['inter_cluster_edges'] else c,
+        'edge_density': density,
+        'conductance': conductance,
+        'normalized_cut': normalized_cut,
+        'expansion': expansion,
+        'intra_inter_ratio': ratio,
+    })
+
+
+def quality_table(files, n_edges=None, keys=keys):
+    """ quality_metrics of every file, stacked with a leading resolution column """
+    frames = []
+    for file_path in files:
+        key = resolution_key(file_path, keys) or os.path.splitext(os.path.basename(file_path))[0]
+        metrics = quality_metrics(read_table(file_path), n_edges)
+        metrics.insert(0, 'resolution', key)
+        frames.append(metrics)
+        print(f"[{key}] {len(metrics)} clusters from {file_path}")
+    return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Per-cluster density, conductance, normalized cut and expansion.')
+    parser.add_argument(
+        'files', metavar='file', type=str, nargs='*',
+        help='per-resolution cluster tables with node, intra- and inter-cluster edge counts'
+        )
+    parser.add_argument(
+        '-i', metavar='input_dir', type=str, default=None,
+        help='instead of files, the table of every key in this directory'
+        )
+    parser.add_argument(
+        '-o', metavar='output', type=str, default='cluster_quality.csv',
+        help='output table (.csv, .tsv, .parquet or .feather)'
+        )
+    parser.add_argument(
+        '-m', metavar='n_edges', type=int, default=None,
+        help='edges in the whole graph (default: inferred from the counts)'
+        )
+    parser.add_argument(
+        '-k', metavar='key', type=str, nargs='+', default=None,
+        help='resolution keys to label the tables with (default: the fixed list)'
+        )
+    parser.add_argument(
+        '-R', metavar='resolutions_file', type=str, default=None,
+        help='resolution keys from resolution_profile.py, followed by any -k keys'
+        )
+    args = parser.parse_args()
+    args.k = selected_keys(args.R, args.k)
+    if args.i:
+        names = os.listdir(args.i)
+        args.files += [os.path.join(args.i, f) for f in (find_file(names, key) for key in args.k) if f]
+    if not args.files:
+        parser.error("no input tables: give files or -i")
+
+    if any(os.path.abspath(f) == os.path.abspath(args.o) for f in args.files):
+        parser.error("the output must not be one of the input tables")
+    table = quality_table(args.files, args.m, args.k)
+    write_table(table, args.o)
+    print(f"Saved {len(table)} clusters to {args.o}")
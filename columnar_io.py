@@ -0,0 +1,111 @@
+# Shared reader/writer for the node-level tables (output_*.csv,
+# expanded_*.csv, aggregated_statistics.tsv).
+#
+# write_table stores .parquet / .feather with typed columns: node and
+# cluster ids as int32 (nullable Int32 where an outer join left gaps; int64 /
+# Int64 when an id does not fit in int32) and
+# every other numeric column as float32. read_table loads only the columns a
+# script asks for, so the pd.to_numeric(errors='coerce') re-typing in the
+# analysis scripts is not needed on these files.
+#
+# Usage: python columnar_io.py output/output_*.csv   (writes output/output_*.parquet)
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+ID_COLUMNS = ['Node_ID', 'node_id', 'fp_int_id', 'Cluster_ID', 'cluster_id']
+
+COLUMNAR_EXTENSIONS = ('.parquet', '.feather', '.arrow')
+
+INT32 = np.iinfo(np.int32)
+
+
+def id_dtype(values):
+    """ int32 for ids that fit in it, else int64; nullable (Int32 / Int64) when any id is missing """
+    fits = values.isna().all() or (INT32.min <= values.min() and values.max() <= INT32.max)
+    if values.isna().any():
+        return 'Int32' if fits else 'Int64'
+    return np.int32 if fits else np.int64
+
+
+def typed(df):
+    """ Copy of df with int32 ids and float32 numeric statistics """
+    out = {}
+    for col in df.columns:
+        values = df[col]
+        if col in ID_COLUMNS:
+            values = pd.to_numeric(values, errors='coerce')
+            out[col] = values.astype(id_dtype(values))
+        elif values.dtype == object:
+            converted = pd.to_numeric(values, errors='coerce')
+            # Only re-type text columns that really are numbers
+            out[col] = converted.astype(np.float32) if converted.notna().sum() == values.notna().sum() else values
+        elif pd.api.types.is_numeric_dtype(values):
+            out[col] = values.astype(np.float32)
+        else:
+            out[col] = values
+    return pd.DataFrame(out, index=df.index)
+
+
+def write_table(df, path, index=False):
+    """ Write df by extension: .parquet / .feather typed, .tsv tab-separated, anything else CSV """
+    ext = os.path.splitext(path)[1]
+    if ext == '.parquet':
+        typed(df).to_parquet(path, index=index)
+    elif ext in ('.feather', '.arrow'):
+        typed(df).reset_index(drop=not index).to_feather(path)
+    elif ext == '.tsv':
+        df.to_csv(path, sep='\t', index=index)
+    else:
+        df.to_csv(path, index=index)
+
+
+def read_table(path, columns=None):
+    """ Read a node table, loading only columns (all if None)
+
+    Columnar files come back already typed; text files are parsed with usecols
+    and their numeric columns coerced once here.
+    """
+    ext = os.path.splitext(path)[1]
+    if ext == '.parquet':
+        return pd.read_parquet(path, columns=columns)
+    if ext in ('.feather', '.arrow'):
+        return pd.read_feather(path, columns=columns)
+    sep = '\t' if ext == '.tsv' else ','
+    df = pd.read_csv(path, sep=sep, usecols=columns)
+    for col in df.columns:
+        if df[col].dtype == object:
+            converted = pd.to_numeric(df[col], errors='coerce')
+            if converted.notna().sum() == df[col].notna().sum():
+                df[col] = converted
+    return df
+
+
+def table_path(path):
+    """ The columnar sibling of a text table if one exists, else path itself """
+    stem = os.path.splitext(path)[0]
+    for ext in COLUMNAR_EXTENSIONS:
+        if os.path.exists(stem + ext):
+            return stem + ext
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert text node tables to typed Parquet.')
+    parser.add_argument(
+        'tables', metavar='table', type=str, nargs='+',
+        help='CSV/TSV node tables'
+        )
+    parser.add_argument(
+        '-f', metavar='format', type=str, default='parquet', choices=['parquet', 'feather'],
+        help='output format (default parquet)'
+        )
+    args = parser.parse_args()
+
+    for table in args.tables:
+        out_path = f"{os.path.splitext(table)[0]}.{args.f}"
+        write_table(read_table(table), out_path)
+        print(f"Converted {table} -> {out_path}")
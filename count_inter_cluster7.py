@@ -0,0 +1,50 @@
+import os
+
+from cluster_edges import load_edges, load_membership, classify_edges, stream_classify_edges
+from resolutions import keys, read_resolutions, resolution_key
+
+# Folder where your files are stored
+folder = "./clusters"  # Update if needed
+edge_file = "cit_hepph_cleaned.tsv"  # Replace with your actual edge list file
+
+# resolution_profile.py's resolutions file, if any, replaces the fixed keys
+resolutions_file = None  # e.g. "cit_hepph_resolutions.txt"
+valid_keys = read_resolutions(resolutions_file) if resolutions_file else keys
+
+# Edges per chunk when streaming (e.g. 5_000_000 for cit-Patents); None loads the edge list whole
+chunksize = None
+
+# Find matching cluster files (whole resolutions only: '0.01' does not match '0.01357')
+cluster_files = [
+    f for f in os.listdir(folder)
+    if f != edge_file and not f.endswith('.npz') and resolution_key(f, valid_keys)
+]
+cluster_files.sort(key=lambda x: valid_keys.index(resolution_key(x, valid_keys)))
+
+# Load every partition, then classify all of them against the same edge arrays
+partitions = {}
+for cluster_file in cluster_files:
+    try:
+        partitions[cluster_file] = load_membership(os.path.join(folder, cluster_file))
+    except Exception as e:
+        print(f"⚠️ Error processing {cluster_file}: {e}")
+
+edge_path = os.path.join(folder, edge_file)
+if chunksize:
+    # Bounded memory: accumulate counts over fixed-size chunks of the edge list
+    results = stream_classify_edges(edge_path, partitions, chunksize=chunksize)
+else:
+    # Load edge list once as integer arrays
+    u, v = load_edges(edge_path)
+    results = classify_edges(u, v, partitions)
+
+for cluster_file, stats in results.items():
+    total = stats['total']
+    inter_pct = stats['inter'] / total * 100 if total else 0
+
+    # Print stats
+    print(f"\nCluster File: {cluster_file}")
+    print(f"Total Edges: {total}")
+    print(f"Intra-cluster Edges: {stats['intra']}")
+    print(f"Inter-cluster Edges: {stats['inter']}")
+    print(f"Percent Inter-cluster: {inter_pct:.2f}%")
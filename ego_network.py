@@ -0,0 +1,114 @@
+# 1-hop ego networks read straight from a graph store's CSR arrays.
+#
+# For a target node the ego network is the target, the papers it cites
+# (successors), the papers citing it (predecessors) and every citation edge
+# among those nodes. Only the target's and the ego nodes' adjacency rows are
+# touched, so extracting it costs the ego nodes' degrees rather than a copy
+# of the whole graph.
+
+import matplotlib.colors as mcolors
+import numpy as np
+import scipy.sparse as sp
+
+from cluster_edges import MISSING
+
+# Edge classes used to color the target's edges in node_visualization*.py
+EDGE_OTHER = 0
+EDGE_SUCCESSOR_CITES_SUCCESSOR = 1   # target -> s, s cites another successor
+EDGE_SUCCESSOR = 2                   # target -> s, s cites no other successor
+EDGE_PREDECESSOR_CITED = 3           # p -> target, p is cited by another predecessor
+EDGE_PREDECESSOR = 4                 # p -> target, p is cited by no other predecessor
+
+# RGBA color of each EDGE_* class, as node_visualization35.py draws them
+EDGE_COLORS = np.array([
+    mcolors.to_rgba('lightcyan', alpha=0.5),    # Cyan for other edges, fallback
+    mcolors.to_rgba('green', alpha=0.9),        # Green: Successor cites another successor
+    mcolors.to_rgba('yellow', alpha=0.9),       # Yellow: Successor doesn't cite other successor
+    mcolors.to_rgba('darkorange', alpha=0.9),   # Dark Orange: Predecessor cites another predecessor
+    mcolors.to_rgba('grey', alpha=0.9),         # Grey: Predecessor doesn't cite another predecessor
+])
+
+
+def _gather_rows(indptr, indices, rows):
+    """ (row of each entry, entries) of the CSR rows `rows`, concatenated """
+    starts = np.asarray(indptr[rows], dtype=np.int64)
+    counts = np.asarray(indptr[rows + 1], dtype=np.int64) - starts
+    offsets = np.cumsum(counts) - counts
+    flat = np.arange(counts.sum()) - np.repeat(offsets, counts) + np.repeat(starts, counts)
+    return np.repeat(rows, counts), np.asarray(indices[flat])
+
+
+class EgoNetwork:
+    """ A target's 1-hop neighbourhood, in original node ids """
+
+    def __init__(self, target, successors, predecessors, nodes, edges):
+        self.target = target
+        self.successors = successors
+        self.predecessors = predecessors
+        self.nodes = nodes
+        self.edges = edges  # (n_edges, 2) source, cited
+
+    def adjacency(self):
+        """ Sparse adjacency of the ego network over positions in self.nodes """
+        local = np.searchsorted(self.nodes, self.edges)
+        n = len(self.nodes)
+        return sp.csr_matrix((np.ones(len(local), dtype=np.int32), (local[:, 0], local[:, 1])), shape=(n, n))
+
+    def edge_classes(self):
+        """ EDGE_* class of every edge in self.edges, from one pass over the adjacency block """
+        A = self.adjacency()
+        is_successor = np.isin(self.nodes, self.successors)
+        is_predecessor = np.isin(self.nodes, self.predecessors)
+        # Per node: does it cite a successor / is it cited by a predecessor
+        cites_successor = A @ is_successor.astype(np.int32) > 0
+        cited_by_predecessor = A.T @ is_predecessor.astype(np.int32) > 0
+
+        local = np.searchsorted(self.nodes, self.edges)
+        u, v = local[:, 0], local[:, 1]
+        t = np.searchsorted(self.nodes, self.target)
+        classes = np.full(len(local), EDGE_OTHER, dtype=np.int8)
+        incoming = (v == t) & is_predecessor[u]
+        classes[incoming] = np.where(cited_by_predecessor[u[incoming]], EDGE_PREDECESSOR_CITED, EDGE_PREDECESSOR)
+        # An edge from the target is classed as outgoing first, as in node_visualization35.py
+        outgoing = (u == t) & is_successor[v]
+        classes[outgoing] = np.where(cites_successor[v[outgoing]], EDGE_SUCCESSOR_CITES_SUCCESSOR, EDGE_SUCCESSOR)
+        return classes
+
+    def to_networkx(self):
+        import networkx as nx
+        G = nx.DiGraph()
+        G.add_nodes_from(self.nodes.tolist())
+        G.add_edges_from(self.edges.tolist())
+        return G
+
+
+def ego_network(graph, target, keep=None):
+    """ EgoNetwork of original node id target in a GraphStore
+
+    keep is an optional boolean mask over dense ids (e.g. the clustered nodes
+    of one resolution); other nodes are left out as if they were not in the
+    graph. Returns None when the target itself is not kept.
+    """
+    t = int(graph.index_of(target))
+    if keep is not None and not keep[t]:
+        return None
+    successors = np.unique(graph.successors(t))
+    predecessors = np.unique(graph.predecessors(t))
+    if keep is not None:
+        successors = successors[keep[successors]]
+        predecessors = predecessors[keep[predecessors]]
+    nodes = np.union1d(np.union1d(successors, predecessors), [t]).astype(np.int64)
+
+    # Citation edges from each ego node that land inside the ego network
+    src, dst = _gather_rows(graph.out_indptr, graph.out_indices, nodes)
+    pos = np.minimum(np.searchsorted(nodes, dst), len(nodes) - 1)
+    inside = nodes[pos] == dst
+    edges = np.unique(np.column_stack([src[inside], dst[inside]]), axis=0)
+
+    ids = np.asarray(graph.node_ids)
+    return EgoNetwork(target, ids[successors], ids[predecessors], ids[nodes], ids[edges])
+
+
+def clustered_mask(clusters):
+    """ keep mask for ego_network from a dense-id cluster array (MISSING = not clustered) """
+    return np.asarray(clusters) != MISSING
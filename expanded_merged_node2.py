@@ -0,0 +1,139 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from columnar_io import COLUMNAR_EXTENSIONS, read_table, table_path, write_table
+from manifest import Manifest
+from resolutions import resolution_key, selected_keys
+
+# Same _diff / _percent_drop columns as expanded_merged_node.py, computed as
+# one NumPy block per file instead of ~20 single-column assignments, with an
+# explicit policy for a zero or missing network (_x) value.
+
+# Use the current working directory
+input_directory = '.'  # Current directory where the script is located
+output_directory = '.'  # You can use the same directory or specify a different one
+
+# (output prefix, network column, cluster column)
+bdid_columns = ['cp_level', 'cp_r_citing_zero', 'cp_r_citing_nonzero', 'tr_citing',
+                'cp_r_cited_zero', 'cp_r_cited_nonzero', 'tr_cited']
+column_pairs = [(col, f'{col}_x', f'{col}_y') for col in bdid_columns] + [
+    ('degree', 'network_degree', 'cluster_degree'),
+    ('indegree', 'network_indegree', 'cluster_indegree'),
+    ('outdegree', 'network_outdegree', 'cluster_outdegree'),
+]
+
+# What percent_drop is when the network value is 0:
+#   'nan'  - undefined (default)
+#   'zero' - 0 when the cluster value is 0 too, undefined otherwise
+#   'inf'  - plain division, as expanded_merged_node.py did (+-inf, or NaN for 0/0)
+ZERO_POLICIES = ['nan', 'zero', 'inf']
+# What a missing value (e.g. a node absent from the cluster tables) means:
+#   'propagate' - diff and percent_drop are NaN (default)
+#   'zero'      - the missing value is treated as 0
+NAN_POLICIES = ['propagate', 'zero']
+
+def diff_and_percent_drop(df, zero_policy='nan', nan_policy='propagate'):
+    """ All _diff and _percent_drop columns of df as one DataFrame, in expanded_merged_node.py order """
+    pairs = [(name, x, y) for name, x, y in column_pairs if x in df.columns and y in df.columns]
+    if not pairs:
+        return pd.DataFrame(index=df.index)
+
+    x = df[[x for _, x, _ in pairs]].to_numpy(dtype=np.float64)
+    y = df[[y for _, _, y in pairs]].to_numpy(dtype=np.float64)
+    if nan_policy == 'zero':
+        x = np.nan_to_num(x, nan=0.0)
+        y = np.nan_to_num(y, nan=0.0)
+
+    diff = x - y
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percent_drop = (y - x) / x * 100
+    if zero_policy == 'nan':
+        percent_drop[x == 0] = np.nan
+    elif zero_policy == 'zero':
+        percent_drop[x == 0] = np.where(y[x == 0] == 0, 0.0, np.nan)
+
+    # Interleave as <name>_diff, <name>_percent_drop for every pair
+    block = np.empty((len(df), 2 * len(pairs)))
+    block[:, 0::2] = diff
+    block[:, 1::2] = percent_drop
+    names = [f'{name}_{kind}' for name, _, _ in pairs for kind in ('diff', 'percent_drop')]
+    return pd.DataFrame(block, index=df.index, columns=names)
+
+def expanded_path(file_path, out_dir, fmt=None):
+    """ Output file name based on the input file name (e.g., 'data1.csv' -> 'expanded_data1.csv') """
+    stem, ext = os.path.splitext(os.path.basename(file_path))
+    return os.path.join(out_dir, f"expanded_{stem}.{fmt or ext.lstrip('.')}")
+
+def expand_file(job):
+    """ Read one merged table, append the diff/percent-drop block and write expanded_<name> """
+    file_path, out_dir, fmt, zero_policy, nan_policy = job
+    merged_df = read_table(file_path)
+    expanded = pd.concat([merged_df, diff_and_percent_drop(merged_df, zero_policy, nan_policy)], axis=1)
+
+    output_file_path = expanded_path(file_path, out_dir, fmt)
+    write_table(expanded, output_file_path)
+    return output_file_path
+
+def input_files(directory, keys=None):
+    """ Merged node tables in directory, skipping earlier expanded_* outputs
+
+    One file per stem: when output_X.csv has a columnar sibling (output_X.parquet)
+    only the columnar one is used, so two jobs never write the same output.
+    With keys, only the tables of those resolutions.
+    """
+    stems = {
+        os.path.join(directory, os.path.splitext(f)[0]) for f in os.listdir(directory)
+        if f.endswith(('.csv',) + COLUMNAR_EXTENSIONS) and not f.startswith('expanded_')
+        and (keys is None or resolution_key(f, keys))
+    }
+    return sorted(table_path(stem + '.csv') for stem in stems)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Add _diff and _percent_drop columns to merged node tables.')
+    parser.add_argument('-i', metavar='input_dir', type=str, default=input_directory)
+    parser.add_argument('-o', metavar='output_dir', type=str, default=output_directory)
+    parser.add_argument(
+        '-f', metavar='format', type=str, default=None, choices=['csv', 'parquet', 'feather'],
+        help='output format (default: same as the input file)'
+        )
+    parser.add_argument('--zero-policy', type=str, default='nan', choices=ZERO_POLICIES)
+    parser.add_argument('--nan-policy', type=str, default='propagate', choices=NAN_POLICIES)
+    parser.add_argument(
+        '-w', metavar='workers', type=int, default=os.cpu_count(),
+        help='files processed in parallel'
+        )
+    parser.add_argument(
+        '-m', metavar='manifest', type=str, default=None,
+        help='content-hash manifest; files whose input and policies are unchanged are skipped'
+        )
+    parser.add_argument(
+        '-k', metavar='key', type=str, nargs='+', default=None,
+        help='only the tables of these resolutions (default: every table)'
+        )
+    parser.add_argument(
+        '-R', metavar='resolutions_file', type=str, default=None,
+        help='only the resolutions in this resolution_profile.py output, and any -k keys'
+        )
+    args = parser.parse_args()
+    keys = selected_keys(args.R, args.k) if args.R or args.k else None
+
+    os.makedirs(args.o, exist_ok=True)
+    params = {'zero_policy': args.zero_policy, 'nan_policy': args.nan_policy}
+    manifest = Manifest(args.m) if args.m else None
+    jobs = []
+    for f in input_files(args.i, keys):
+        out = expanded_path(f, args.o, args.f)
+        if manifest and manifest.is_current('expand', out, [f], [out], params):
+            print(f"Unchanged, reusing: {out}")
+            continue
+        jobs.append((f, args.o, args.f, args.zero_policy, args.nan_policy))
+
+    with ProcessPoolExecutor(max_workers=args.w) as pool:
+        for (f, *_), output_file_path in zip(jobs, pool.map(expand_file, jobs)):
+            if manifest:
+                manifest.record('expand', output_file_path, [f], [output_file_path], params)
+            print(f"Processed and exported: {output_file_path}")
@@ -0,0 +1,169 @@
+# Compact binary store for the cit_*_cleaned edge lists.
+#
+# The text edge list is parsed once and saved as a directory of .npy files:
+#   node_ids.npy     original node id of every dense id (sorted, int64)
+#   out_indptr.npy   CSR row pointers for successors (int64, n_nodes + 1)
+#   out_indices.npy  dense successor ids (int32), sorted within each row
+#   in_indptr.npy    CSR row pointers for predecessors
+#   in_indices.npy   dense predecessor ids (int32), sorted within each row
+#   meta.json        node/edge counts and the source edge list
+# Every array can be memory-mapped, so later stages load it in milliseconds.
+#
+# Usage: python graph_store.py -i cit_hepph_cleaned.tsv -o cit_hepph_store
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+ARRAYS = ['node_ids', 'out_indptr', 'out_indices', 'in_indptr', 'in_indices']
+
+# Edges converted to Python pairs at a time when building an igraph Graph
+IGRAPH_CHUNKSIZE = 1_000_000
+
+
+def _csr(rows, cols, n_nodes):
+    """ CSR indptr/indices for rows -> cols, columns sorted within each row """
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_nodes), out=indptr[1:])
+    return indptr, cols[order].astype(np.int32)
+
+
+def igraph_from_arrays(n_nodes, src, dst, directed=False, chunksize=IGRAPH_CHUNKSIZE):
+    """ igraph Graph with edges src[i] -> dst[i]
+
+    igraph only takes edges as Python pairs (handing it the ndarray makes it
+    iterate numpy scalars, several times slower), so the pairs are generated
+    chunksize edges at a time instead of as one list for the whole graph.
+    """
+    import igraph
+
+    def pairs():
+        for start in range(0, len(src), chunksize):
+            yield from np.column_stack([src[start:start + chunksize], dst[start:start + chunksize]]).tolist()
+
+    return igraph.Graph(n=n_nodes, edges=pairs(), directed=directed)
+
+
+class GraphStore:
+    """ Directed graph as dense int32 ids with out- and in-neighbor CSR arrays """
+
+    def __init__(self, node_ids, out_indptr, out_indices, in_indptr, in_indices):
+        self.node_ids = node_ids
+        self.out_indptr = out_indptr
+        self.out_indices = out_indices
+        self.in_indptr = in_indptr
+        self.in_indices = in_indices
+
+    @classmethod
+    def from_edges(cls, src, dst):
+        """ Build from original-id edge arrays (one row per edge) """
+        node_ids, inverse = np.unique(np.concatenate([src, dst]), return_inverse=True)
+        n_nodes = len(node_ids)
+        if n_nodes > np.iinfo(np.int32).max:
+            raise ValueError(f"{n_nodes} nodes do not fit in int32 ids")
+        u = inverse[:len(src)].astype(np.int32)
+        v = inverse[len(src):].astype(np.int32)
+        out_indptr, out_indices = _csr(u, v, n_nodes)
+        in_indptr, in_indices = _csr(v, u, n_nodes)
+        return cls(node_ids, out_indptr, out_indices, in_indptr, in_indices)
+
+    @property
+    def n_nodes(self):
+        return len(self.node_ids)
+
+    @property
+    def n_edges(self):
+        return len(self.out_indices)
+
+    def index_of(self, ids):
+        """ Dense ids for original node ids; raises KeyError for unknown ids """
+        ids = np.asarray(ids)
+        pos = np.minimum(np.searchsorted(self.node_ids, ids), self.n_nodes - 1)
+        if not np.all(self.node_ids[pos] == ids):
+            missing = np.atleast_1d(ids)[np.atleast_1d(self.node_ids[pos] != ids)]
+            raise KeyError(f"node ids not in graph: {missing[:5].tolist()}")
+        return pos
+
+    def successors(self, i):
+        """ Dense ids cited by dense node i """
+        return self.out_indices[self.out_indptr[i]:self.out_indptr[i + 1]]
+
+    def predecessors(self, i):
+        """ Dense ids citing dense node i """
+        return self.in_indices[self.in_indptr[i]:self.in_indptr[i + 1]]
+
+    def out_degree(self):
+        return np.diff(self.out_indptr)
+
+    def in_degree(self):
+        return np.diff(self.in_indptr)
+
+    def edges(self):
+        """ Dense (src, dst) arrays, ordered by source """
+        src = np.repeat(np.arange(self.n_nodes, dtype=np.int32), self.out_degree())
+        return src, np.asarray(self.out_indices)
+
+    def original_edges(self):
+        """ (src, dst) arrays in original node ids """
+        src, dst = self.edges()
+        return self.node_ids[src], self.node_ids[dst]
+
+    def to_igraph(self, directed=False):
+        """ igraph Graph with the original ids as the 'name' attribute """
+        src, dst = self.edges()
+        net = igraph_from_arrays(self.n_nodes, src, dst, directed=directed)
+        net.vs['name'] = [str(n) for n in self.node_ids.tolist()]
+        return net
+
+    def save(self, store_dir, source=None):
+        os.makedirs(store_dir, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(store_dir, f"{name}.npy"), getattr(self, name))
+        meta = {'n_nodes': self.n_nodes, 'n_edges': self.n_edges, 'source': source}
+        with open(os.path.join(store_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+
+def read_edge_list(edge_file):
+    """ Parse a headerless tab-separated edge list into int64 (src, dst) arrays """
+    df = pd.read_csv(edge_file, sep='\t', header=None, usecols=[0, 1], dtype=np.int64)
+    return df[0].to_numpy(), df[1].to_numpy()
+
+
+def convert(edge_file, store_dir):
+    """ One-time conversion of a text edge list into a graph store directory """
+    graph = GraphStore.from_edges(*read_edge_list(edge_file))
+    graph.save(store_dir, source=os.path.abspath(edge_file))
+    return graph
+
+
+def is_store(path):
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, 'meta.json'))
+
+
+def load_graph(path, mmap_mode='r'):
+    """ Load a graph store directory (memory-mapped) or, failing that, parse a text edge list """
+    if is_store(path):
+        arrays = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in ARRAYS]
+        return GraphStore(*arrays)
+    return GraphStore.from_edges(*read_edge_list(path))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert a cleaned edge list into a binary graph store.')
+    parser.add_argument(
+        '-i', metavar='ip_net', type=str, required=True,
+        help='input network edge-list path'
+        )
+    parser.add_argument(
+        '-o', metavar='store_dir', type=str, required=True,
+        help='output store directory'
+        )
+    args = parser.parse_args()
+
+    graph = convert(args.i, args.o)
+    print(f"Saved {graph.n_nodes} nodes, {graph.n_edges} edges to {args.o}")
@@ -0,0 +1,127 @@
+# The cit-HepPh workflow as pipeline stages:
+#
+#   graph_store -> resolution_profile -> partition_matrix -> bdid -> expand
+#               -> leiden_sweep -------^                          -> cluster_stats -> merge_cluster_stats -> cluster_quality
+#                                     -> cluster_edges ------------------------------^
+#
+# By default the CPM resolutions are discovered, not fixed: the
+# resolution_profile stage writes every distinct CPM partition to clusters/
+# and their resolutions to clusters/cit_hepph_resolutions.txt, and the
+# leiden_sweep stage only clusters modularity. The downstream stages read that
+# file when they run (-R, plus -k modularity), so the stage graph does not
+# depend on an earlier run and a changed profile flows through on the rerun.
+# --fixed-grid clusters the fixed resolutions.keys in leiden_sweep instead and
+# passes them with -k.
+#
+# The memberships go to clusters/ so that the per-key file matching of
+# cluster_edges only ever sees them. One bdid stage computes every
+# resolution's BDID from the partition matrix, reading the network once;
+# expand and cluster_stats skip the tables of resolutions no longer listed.
+# cluster_edges counts nodes, intra- and inter-cluster edges per cluster,
+# merge_cluster_stats joins the per-cluster BDID statistics onto those counts
+# and cluster_quality adds edge density, conductance and the other metrics.
+#
+# leiden_sweep loads the graph store once and clusters every resolution in
+# forked workers (run_leiden_sweep.py -w). Rerunning skips every stage whose
+# inputs are unchanged.
+#
+# Usage: python hepph_pipeline.py -w 4                (everything)
+#        python hepph_pipeline.py cluster_stats       (one stage and what it needs)
+#        python hepph_pipeline.py --fixed-grid -w 4   (resolutions.keys, no profile)
+
+import os
+import sys
+
+from resolutions import keys, membership_path
+from pipeline import Stage, main
+
+python = sys.executable
+here = os.path.dirname(os.path.abspath(__file__))
+script = lambda name: os.path.join(here, name)
+
+# === CONFIGURATION ===
+edge_file = 'cit_hepph_cleaned.tsv'
+cluster_dir = 'clusters'
+prefix = os.path.join(cluster_dir, 'cit_hepph')
+n_iterations = 2
+sweep_workers = os.cpu_count()  # resolutions clustered in parallel by the one leiden_sweep stage
+resolutions_file = f'{prefix}_resolutions.txt'  # written by resolution_profile.py
+profile_file = f'{prefix}_resolution_profile.csv'
+profile_range = (0.001, 0.2)
+store_dir = 'cit_hepph_store'
+partition_dir = 'cit_hepph_partitions'
+bdid_dir = 'bdid_output'
+expanded_dir = 'expanded_output'
+cube_dir = 'cluster_cube'
+stats_dir = 'cluster_stats'  # cluster_stats4.py's per-resolution <file>_aggregated.csv
+counts_dir = 'cluster_counts'
+merged_dir = 'cluster_merged'
+quality_file = 'cluster_quality.csv'
+
+membership = lambda key: membership_path(prefix, key)
+
+
+def build_stages(fixed_grid=False):
+    """ The stages, with discovered CPM resolutions or with the fixed resolutions.keys """
+    if fixed_grid:
+        leiden_keys = keys
+        key_args, key_inputs = ['-k'] + keys, []
+        memberships = [membership(key) for key in keys]
+    else:
+        leiden_keys = ['modularity']
+        key_args, key_inputs = ['-R', resolutions_file, '-k', 'modularity'], [resolutions_file]
+        memberships = [cluster_dir]
+
+    stages = [
+        Stage('graph_store', [python, script('graph_store.py'), '-i', edge_file, '-o', store_dir],
+              inputs=[edge_file], outputs=[store_dir]),
+    ]
+    if not fixed_grid:
+        stages.append(
+            Stage('resolution_profile',
+                  [python, script('resolution_profile.py'), '-i', store_dir, '-o', prefix,
+                   '-l', profile_range[0], '-u', profile_range[1], '-n', n_iterations],
+                  inputs=[store_dir], outputs=[resolutions_file, profile_file]))
+    stages += [
+        Stage('leiden_sweep',
+              [python, script('run_leiden_sweep.py'), '-i', store_dir, '-o', prefix, '-r'] + leiden_keys
+              + ['-n', n_iterations, '-w', sweep_workers],
+              inputs=[store_dir], outputs=[membership(key) for key in leiden_keys]),
+        Stage('partition_matrix',
+              [python, script('partition_matrix.py'), '-g', store_dir, '-o', partition_dir, '-P', prefix] + key_args,
+              inputs=[store_dir] + memberships + key_inputs, outputs=[partition_dir]),
+        Stage('bdid',
+              [python, script('bdid.py'), '-g', store_dir, '-p', partition_dir, '-o', bdid_dir],
+              inputs=[store_dir, partition_dir], outputs=[bdid_dir]),
+        Stage('expand',
+              [python, script('expanded_merged_node2.py'), '-i', bdid_dir, '-o', expanded_dir, '-w', 1] + key_args,
+              inputs=[bdid_dir] + key_inputs, outputs=[expanded_dir]),
+        Stage('cluster_stats',
+              [python, script('cluster_level_profiles/output_files/cluster_stats4.py'),
+               '-i', bdid_dir, '-o', cube_dir, '-s', stats_dir] + key_args,
+              inputs=[bdid_dir] + key_inputs, outputs=[cube_dir, stats_dir]),
+        Stage('cluster_edges',
+              [python, script('summary_cluster_edges3_w_intercluster6.py'),
+               '-c', cluster_dir, '-e', edge_file, '-o', counts_dir] + key_args,
+              inputs=[edge_file] + memberships + key_inputs, outputs=[counts_dir]),
+        Stage('merge_cluster_stats',
+              [python, script('cluster_level_profiles/merge_cluster_stats12.py'),
+               '-i', counts_dir, '-s', stats_dir, '-o', merged_dir, '-w', 1] + key_args,
+              inputs=[counts_dir, stats_dir] + key_inputs, outputs=[merged_dir]),
+        Stage('cluster_quality',
+              [python, script('cluster_quality.py'), '-i', merged_dir, '-o', quality_file] + key_args,
+              inputs=[merged_dir] + key_inputs, outputs=[quality_file]),
+    ]
+    return stages
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--fixed-grid', action='store_true',
+        help='cluster the fixed resolutions.keys instead of profiling the CPM resolutions'
+        )
+
+
+if __name__ == "__main__":
+    main(lambda args: build_stages(args.fixed_grid), description='Run the cit-HepPh clustering-to-profile pipeline.',
+         add_arguments=add_arguments)
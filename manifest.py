@@ -0,0 +1,89 @@
+# Content-hash manifest for pipeline intermediates.
+#
+# Every (stage, key) entry - key is usually a resolution label such as
+# '0.05' - records the sha256 of each input and output file and the stage
+# parameters. A stage can then skip a resolution when nothing it reads has
+# changed and its outputs are still the ones it wrote, and only redo the
+# resolutions whose inputs (say, a re-run 0.05 membership) actually changed.
+#
+# Hashes are cached by (size, mtime) so unchanged files are not re-read.
+
+import hashlib
+import json
+import os
+
+DEFAULT_MANIFEST = '.pipeline_manifest.json'
+
+_CHUNK = 1 << 20
+
+
+def _hash_file(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_CHUNK), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class Manifest:
+    """ JSON file of content hashes per (stage, key) """
+
+    def __init__(self, path=DEFAULT_MANIFEST):
+        self.path = path
+        self.entries = {}
+        self.hash_cache = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.entries = data.get('entries', {})
+            self.hash_cache = data.get('hash_cache', {})
+
+    def content_hash(self, path):
+        """ sha256 of a file, or of every file under a directory (names included) """
+        if os.path.isdir(path):
+            h = hashlib.sha256()
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    full = os.path.join(root, name)
+                    h.update(os.path.relpath(full, path).encode())
+                    h.update(self.content_hash(full).encode())
+            return h.hexdigest()
+
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        cached = self.hash_cache.get(key)
+        if cached and cached['size'] == st.st_size and cached['mtime'] == st.st_mtime_ns:
+            return cached['sha256']
+        digest = _hash_file(path)
+        self.hash_cache[key] = {'size': st.st_size, 'mtime': st.st_mtime_ns, 'sha256': digest}
+        return digest
+
+    def _hashes(self, paths):
+        return {os.path.abspath(p): self.content_hash(p) for p in paths}
+
+    def is_current(self, stage, key, inputs, outputs, params=None):
+        """ True when inputs and params match the last record and every output is unchanged since """
+        entry = self.entries.get(stage, {}).get(str(key))
+        if entry is None or entry.get('params') != params:
+            return False
+        if any(not os.path.exists(p) for p in list(inputs) + list(outputs)):
+            return False
+        return (entry['inputs'] == self._hashes(inputs)
+                and entry['outputs'] == self._hashes(outputs))
+
+    def record(self, stage, key, inputs, outputs, params=None):
+        """ Store the current hashes of inputs and outputs for (stage, key) and save """
+        self.entries.setdefault(stage, {})[str(key)] = {
+            'inputs': self._hashes(inputs),
+            'outputs': self._hashes(outputs),
+            'params': params,
+        }
+        self.save()
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'entries': self.entries, 'hash_cache': self.hash_cache}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
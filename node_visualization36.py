@@ -0,0 +1,109 @@
+import os
+import time
+
+import matplotlib.pyplot as plt
+import networkx as nx
+import numpy as np
+
+from cluster_edges import load_membership, lookup_clusters
+from ego_network import EDGE_COLORS, clustered_mask, ego_network
+from graph_store import load_graph
+from resolutions import keys
+
+# Same pictures as node_visualization35.py, but the graph is loaded once as a
+# CSR graph store and each resolution's ego network is read straight from it,
+# instead of copying the whole networkx graph per resolution.
+
+# === Config ===
+edge_file = 'cit_hepph_cleaned.tsv'  # cleaned edge list or graph_store directory
+target_node = 9606399
+
+# === Cluster files ===
+# "cpm_0.01": "cit_hepph_cpm_0.01.tsv", ..., "modularity": "cit_hepph_modularity.tsv"
+cluster_files = {
+    key if key == 'modularity' else f"cpm_{key}":
+        f"cit_hepph_{key}.tsv" if key == 'modularity' else f"cit_hepph_cpm_{key}.tsv"
+    for key in keys
+}
+
+# === Load edges ===
+graph = load_graph(edge_file)
+node_ids = np.asarray(graph.node_ids)
+
+# === Visualization Function ===
+def visualize_subgraph(cluster_file, label):
+    clusters = lookup_clusters(node_ids, *load_membership(cluster_file))
+
+    start = time.perf_counter()
+    try:
+        ego = ego_network(graph, target_node, keep=clustered_mask(clusters))
+    except KeyError:
+        # target_node is not in the graph at all
+        ego = None
+    if ego is None:
+        print(f"[!] Target node '{target_node}' not found in {label}. Skipping.")
+        return
+    print(f"[{label}] ego network: {len(ego.nodes)} nodes, {len(ego.edges)} edges "
+          f"in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    # Neighbors
+    level1_successors = set(ego.successors.tolist())
+    subgraph = ego.to_networkx()
+    node_cluster = dict(zip(ego.nodes.tolist(), clusters[graph.index_of(ego.nodes)].tolist()))
+
+    # Node appearance
+    target_cluster = node_cluster[target_node]
+    node_colors = []
+    node_sizes = []
+
+    for node in subgraph.nodes():
+        if node == target_node:
+            node_colors.append('red')
+            node_sizes.append(100)
+        elif node_cluster[node] == target_cluster:
+            if node in level1_successors:
+                node_colors.append('darkblue')  # Successor inside cluster (dark blue)
+            else:
+                node_colors.append('darkorange')  # Predecessor inside cluster (dark orange)
+            node_sizes.append(60)
+        else:
+            if node in level1_successors:
+                node_colors.append('lightblue')  # Successor outside cluster (light blue)
+            else:
+                node_colors.append('cyan')  # Predecessor outside cluster (cyan)
+            node_sizes.append(60)
+
+    # === Edge coloring logic ===
+    # Successor-cites-successor / predecessor-cited-by-predecessor flags for
+    # every edge come from one sparse pass over the ego adjacency
+    edge_colors = EDGE_COLORS[ego.edge_classes()]
+
+    # === Layout: spread center, ease outer ring ===
+    pos = nx.spring_layout(subgraph, seed=42, k=2.5, iterations=100)
+    for node in pos:
+        if node_cluster[node] != target_cluster and node != target_node:
+            pos[node] = [coord * 1.8 for coord in pos[node]]
+        else:
+            pos[node] = [coord * 0.9 for coord in pos[node]]
+
+    # === Draw ===
+    plt.figure(figsize=(12, 10))
+    nx.draw_networkx_nodes(subgraph, pos, node_color=node_colors, node_size=node_sizes, alpha=0.8)
+    nx.draw_networkx_edges(subgraph, pos, edgelist=[tuple(e) for e in ego.edges.tolist()], edge_color=edge_colors, arrows=True, arrowsize=12, width=0.8)
+    plt.title(f"{label} – Target Node Neighborhood (Refined Colors)")
+    plt.axis('off')
+    plt.tight_layout()
+
+    out_file = f"visual_{label}_target_view_shaded.png"
+    plt.savefig(out_file)
+    plt.close()
+    print(f"[✓] Saved: {out_file}")
+
+# === Run all files ===
+if __name__ == "__main__":
+    for label, cluster_file in cluster_files.items():
+        if not os.path.isfile(cluster_file):
+            print(f"[!] File not found: {cluster_file}, skipping.")
+            continue
+        print(f"[+] Processing {cluster_file}")
+        visualize_subgraph(cluster_file, label=label)
@@ -0,0 +1,201 @@
+import argparse
+import multiprocessing
+import os
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import networkx as nx
+import numpy as np
+
+from ego_network import EDGE_COLORS, clustered_mask, ego_network
+from graph_store import load_graph
+from partition_matrix import build_partition_matrix, load_partition_matrix, partition_rows
+from resolutions import keys, membership_path, read_resolutions
+
+# Batch version of node_visualization36.py: renders every target x resolution
+# figure. The graph and all memberships are loaded once in the parent and
+# shared with forked workers; each worker takes whole targets, computes one
+# spring layout per target and reuses it for all resolution views.
+#
+# Usage: python node_visualization37.py -t 9606399 9711200 -w 4
+#        python node_visualization37.py -T targets.txt -g cit_hepph_store -p cit_hepph_partitions
+#        python node_visualization37.py -t 9606399 -R cit_hepph_resolutions.txt
+
+# === Config ===
+edge_file = 'cit_hepph_cleaned.tsv'  # cleaned edge list or graph_store directory
+target_nodes = [9606399]
+output_dir = '.'
+prefix = 'cit_hepph'  # membership files: <prefix>_cpm_<r>.tsv, <prefix>_modularity.tsv
+
+# Graph and (n_nodes, n_resolutions) cluster matrix shared with forked workers;
+# set before the pool is created
+_graph = None
+_clusters = None
+_labels = None
+
+
+def node_styles(ego, node_cluster, target_cluster):
+    """ Node colors and sizes, in ego.nodes order """
+    level1_successors = set(ego.successors.tolist())
+    node_colors = []
+    node_sizes = []
+    for node in ego.nodes.tolist():
+        if node == ego.target:
+            node_colors.append('red')
+            node_sizes.append(100)
+        elif node_cluster[node] == target_cluster:
+            if node in level1_successors:
+                node_colors.append('darkblue')  # Successor inside cluster (dark blue)
+            else:
+                node_colors.append('darkorange')  # Predecessor inside cluster (dark orange)
+            node_sizes.append(60)
+        else:
+            if node in level1_successors:
+                node_colors.append('lightblue')  # Successor outside cluster (light blue)
+            else:
+                node_colors.append('cyan')  # Predecessor outside cluster (cyan)
+            node_sizes.append(60)
+    return node_colors, node_sizes
+
+
+def edge_styles(ego):
+    """ Edge colors, in ego.edges order (see node_visualization35.py) """
+    return EDGE_COLORS[ego.edge_classes()]
+
+
+def draw_view(ego, node_cluster, layout, label, out_file):
+    """ Render one resolution's view of a target using a precomputed base layout """
+    subgraph = ego.to_networkx()
+    target_cluster = node_cluster[ego.target]
+    node_colors, node_sizes = node_styles(ego, node_cluster, target_cluster)
+
+    # === Layout: spread center, ease outer ring ===
+    pos = {}
+    for node in ego.nodes.tolist():
+        if node_cluster[node] != target_cluster and node != ego.target:
+            pos[node] = layout[node] * 1.8
+        else:
+            pos[node] = layout[node] * 0.9
+
+    # === Draw ===
+    plt.figure(figsize=(12, 10))
+    nx.draw_networkx_nodes(subgraph, pos, nodelist=ego.nodes.tolist(),
+                           node_color=node_colors, node_size=node_sizes, alpha=0.8)
+    nx.draw_networkx_edges(subgraph, pos, edgelist=[tuple(e) for e in ego.edges.tolist()],
+                           edge_color=edge_styles(ego), arrows=True, arrowsize=12, width=0.8)
+    plt.title(f"{label} – Target Node Neighborhood (Refined Colors)")
+    plt.axis('off')
+    plt.tight_layout()
+    plt.savefig(out_file)
+    plt.close()
+
+
+def render_target(job):
+    """ Worker: every resolution's figure for one target, sharing one layout """
+    target, out_dir = job
+    start = time.time()
+    try:
+        full = ego_network(_graph, target)
+    except KeyError:
+        print(f"[!] Target node '{target}' not in the graph. Skipping.")
+        return target, [], time.time() - start
+    # One layout over the unrestricted ego network; each resolution's view
+    # uses the positions of the nodes it keeps
+    layout = nx.spring_layout(full.to_networkx(), seed=42, k=2.5, iterations=100)
+
+    saved = []
+    for r, label in enumerate(_labels):
+        clusters = _clusters[:, r]
+        ego = ego_network(_graph, target, keep=clustered_mask(clusters))
+        if ego is None:
+            print(f"[!] Target node '{target}' not found in {label}. Skipping.")
+            continue
+        node_cluster = dict(zip(ego.nodes.tolist(), clusters[_graph.index_of(ego.nodes)].tolist()))
+        out_file = os.path.join(out_dir, f"visual_{target}_{label}_target_view_shaded.png")
+        draw_view(ego, node_cluster, layout, label, out_file)
+        saved.append(out_file)
+    return target, saved, time.time() - start
+
+
+def read_targets(path):
+    """ One node id per line; blank lines and # comments are ignored """
+    with open(path) as f:
+        return [int(line.split('#')[0]) for line in f if line.split('#')[0].strip()]
+
+
+def view_label(resolution_label):
+    """ partition_matrix label -> node_visualization35 label ('0.1' -> 'cpm_0.1') """
+    return resolution_label if resolution_label == 'modularity' else f"cpm_{resolution_label}"
+
+
+def resolution_files(keys):
+    """ cluster_files for resolution keys ('0.01' -> 'cpm_0.01': 'cit_hepph_cpm_0.01.tsv'), modularity last """
+    keys = [k for k in keys if k != 'modularity'] + ['modularity']
+    return {view_label(k): membership_path(prefix, k) for k in keys}
+
+
+# === Cluster files === (resolutions.keys, or -R)
+cluster_files = resolution_files(keys)
+
+
+def render_targets(graph, clusters, labels, targets, out_dir, workers=1):
+    """ Render every target x resolution figure; clusters is (n_nodes, n_labels) over graph's dense ids """
+    global _graph, _clusters, _labels
+    _graph, _clusters, _labels = graph, np.asarray(clusters), list(labels)
+
+    known = np.isin(targets, np.asarray(graph.node_ids))
+    for target in np.asarray(targets)[~known].tolist():
+        print(f"[!] Target node '{target}' not in the graph. Skipping.")
+    jobs = [(int(t), out_dir) for t in np.asarray(targets)[known]]
+    if workers > 1 and len(jobs) > 1:
+        # fork so every worker sees the already-loaded graph and memberships
+        ctx = multiprocessing.get_context('fork')
+        with ctx.Pool(min(workers, len(jobs))) as pool:
+            results = list(pool.imap_unordered(render_target, jobs))
+    else:
+        results = [render_target(job) for job in jobs]
+
+    for target, saved, seconds in results:
+        print(f"[✓] {target}: {len(saved)} views in {seconds:.1f}s")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Render ego-network views of many targets across resolutions.')
+    parser.add_argument('-t', metavar='target', type=int, nargs='+', default=None, help='target node ids')
+    parser.add_argument('-T', metavar='targets_file', type=str, default=None, help='file of target node ids')
+    parser.add_argument('-g', metavar='graph', type=str, default=edge_file,
+                        help='cleaned edge list or graph_store directory')
+    parser.add_argument('-p', metavar='partition_matrix', type=str, default=None,
+                        help='partition_matrix directory (default: the cluster_files above)')
+    parser.add_argument('-o', metavar='out_dir', type=str, default=output_dir)
+    parser.add_argument('-w', metavar='workers', type=int, default=os.cpu_count())
+    parser.add_argument('-R', metavar='resolutions_file', type=str, default=None,
+                        help='resolution keys from resolution_profile.py (plus modularity) instead of cluster_files')
+    args = parser.parse_args()
+    if args.R:
+        cluster_files = resolution_files(read_resolutions(args.R))
+
+    targets = (args.t or []) + (read_targets(args.T) if args.T else [])
+    targets = targets or target_nodes
+
+    graph = load_graph(args.g)
+    node_ids = np.asarray(graph.node_ids)
+    if args.p:
+        pm = load_partition_matrix(args.p)
+        clusters = partition_rows(graph, pm)
+        labels = [view_label(label) for label in pm.labels]
+        if args.R:
+            columns = [r for r, label in enumerate(labels) if label in cluster_files]
+            clusters, labels = np.asarray(clusters)[:, columns], [labels[r] for r in columns]
+    else:
+        present = {label: f for label, f in cluster_files.items() if os.path.isfile(f)}
+        for label in cluster_files.keys() - present.keys():
+            print(f"[!] File not found: {cluster_files[label]}, skipping.")
+        pm = build_partition_matrix(list(present.values()), node_ids=node_ids, labels=list(present))
+        clusters, labels = np.asarray(pm.matrix), pm.labels
+
+    os.makedirs(args.o, exist_ok=True)
+    render_targets(graph, clusters, labels, targets, args.o, workers=args.w)
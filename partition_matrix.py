@@ -0,0 +1,157 @@
+# All resolutions' memberships aligned to one dense node index.
+#
+# The store directory holds:
+#   node_ids.npy   original node id of every row (sorted, int64)
+#   matrix.npy     (n_nodes, n_partitions) int32 cluster ids, -1 = unassigned
+#   meta.json      resolution label of every column and the source files
+# matrix.npy is memory-mapped on load, so the clusters of a node under every
+# resolution is a zero-copy row slice.
+#
+# Usage: python partition_matrix.py -o cit_hepph_partitions cit_hepph_cpm_*.tsv cit_hepph_modularity.tsv
+#        python partition_matrix.py -o cit_hepph_partitions -P clusters/cit_hepph -R clusters/cit_hepph_resolutions.txt -k modularity
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+from cluster_edges import MISSING, load_membership, lookup_clusters
+from graph_store import is_store, load_graph
+from resolutions import membership_path, selected_keys
+
+
+def resolution_label(cluster_file):
+    """ 'cit_hepph_cpm_0.01.tsv' -> '0.01', 'cit_hepph_modularity.tsv' -> 'modularity' """
+    name = os.path.splitext(os.path.basename(cluster_file))[0]
+    if name.endswith('modularity'):
+        return 'modularity'
+    return name.rsplit('_cpm_', 1)[-1]
+
+
+class PartitionMatrix:
+    """ Cluster id of every node (row) under every resolution (column) """
+
+    def __init__(self, node_ids, matrix, labels, sources=None):
+        self.node_ids = node_ids
+        self.matrix = matrix
+        self.labels = list(labels)
+        self.sources = sources
+
+    @property
+    def n_nodes(self):
+        return self.matrix.shape[0]
+
+    def index_of(self, ids):
+        """ Row index of original node ids, -1 for nodes not in the matrix """
+        ids = np.asarray(ids)
+        pos = np.minimum(np.searchsorted(self.node_ids, ids), self.n_nodes - 1)
+        return np.where(self.node_ids[pos] == ids, pos, -1)
+
+    def clusters_of(self, node_id):
+        """ Cluster ids of one node under every resolution (a view, no copy) """
+        i = int(self.index_of(node_id))
+        if i < 0:
+            raise KeyError(f"node {node_id} not in partition matrix")
+        return self.matrix[i]
+
+    def column(self, label):
+        """ Cluster id of every row under one resolution """
+        return self.matrix[:, self.labels.index(label)]
+
+    def partitions(self):
+        """ {label: (node_ids, clusters)} of assigned nodes, as taken by cluster_edges.classify_edges """
+        result = {}
+        for label in self.labels:
+            clusters = self.column(label)
+            assigned = clusters != MISSING
+            result[label] = (self.node_ids[assigned], clusters[assigned])
+        return result
+
+    def save(self, out_dir, sources=None):
+        sources = sources or self.sources
+        os.makedirs(out_dir, exist_ok=True)
+        np.save(os.path.join(out_dir, 'node_ids.npy'), self.node_ids)
+        np.save(os.path.join(out_dir, 'matrix.npy'), np.ascontiguousarray(self.matrix))
+        meta = {'labels': self.labels, 'n_nodes': int(self.n_nodes), 'sources': sources}
+        with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+
+def build_partition_matrix(cluster_files, node_ids=None, labels=None):
+    """ Align membership files to one node index
+
+    node_ids defaults to the sorted union of every file's nodes; pass a graph
+    store's node_ids to line the rows up with its dense ids instead.
+    """
+    labels = labels or [resolution_label(f) for f in cluster_files]
+    memberships = [load_membership(f) for f in cluster_files]
+    if node_ids is None:
+        node_ids = np.unique(np.concatenate([nodes for nodes, _ in memberships]))
+
+    matrix = np.empty((len(node_ids), len(memberships)), dtype=np.int32)
+    for p, (nodes, clusters) in enumerate(memberships):
+        if len(clusters) and clusters.max() > np.iinfo(np.int32).max:
+            raise ValueError(f"cluster ids in {cluster_files[p]} do not fit in int32")
+        matrix[:, p] = lookup_clusters(node_ids, nodes, clusters)
+    return PartitionMatrix(node_ids, matrix, labels)
+
+
+def load_partition_matrix(path, mmap_mode='r'):
+    """ Load a partition matrix directory with matrix.npy memory-mapped """
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    node_ids = np.load(os.path.join(path, 'node_ids.npy'))
+    matrix = np.load(os.path.join(path, 'matrix.npy'), mmap_mode=mmap_mode)
+    return PartitionMatrix(node_ids, matrix, meta['labels'], meta.get('sources'))
+
+
+def partition_rows(graph, pm):
+    """ PartitionMatrix rows gathered into the graph's dense id order (MISSING where absent) """
+    rows = pm.index_of(np.asarray(graph.node_ids))
+    aligned = np.asarray(pm.matrix)[np.maximum(rows, 0)]
+    aligned[rows < 0] = MISSING
+    return aligned
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the partition matrix for a set of membership files.')
+    parser.add_argument(
+        'cluster_files', metavar='cluster_file', type=str, nargs='*',
+        help='membership TSVs, one per resolution'
+        )
+    parser.add_argument(
+        '-P', metavar='prefix', type=str, default=None,
+        help='membership prefix of run_leiden_sweep.py / resolution_profile.py; '
+             'adds <prefix>_cpm_<r>.tsv for every -R / -k key'
+        )
+    parser.add_argument('-k', metavar='key', type=str, nargs='+', default=None)
+    parser.add_argument(
+        '-R', metavar='resolutions_file', type=str, default=None,
+        help='keys from resolution_profile.py output, followed by any -k keys'
+        )
+    parser.add_argument(
+        '-o', metavar='out_dir', type=str, required=True,
+        help='output directory'
+        )
+    parser.add_argument(
+        '-g', metavar='graph_store', type=str, default=None,
+        help='graph_store directory whose dense ids define the rows'
+        )
+    args = parser.parse_args()
+    if args.R or args.k:
+        if not args.P:
+            parser.error("-R and -k need the membership prefix -P")
+        args.cluster_files += [membership_path(args.P, key) for key in selected_keys(args.R, args.k)]
+    if not args.cluster_files:
+        parser.error("no membership files: give files, or -P with -R or -k")
+
+    node_ids = None
+    if args.g:
+        if not is_store(args.g):
+            parser.error(f"{args.g} is not a graph_store directory")
+        node_ids = np.asarray(load_graph(args.g).node_ids)
+
+    pm = build_partition_matrix(args.cluster_files, node_ids=node_ids)
+    pm.save(args.o, sources=[os.path.abspath(f) for f in args.cluster_files])
+    print(f"Saved {pm.n_nodes} nodes x {len(pm.labels)} resolutions {pm.labels} to {args.o}")
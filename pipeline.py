@@ -0,0 +1,234 @@
+# Stage-graph runner for the clustering -> BDID -> profile workflow.
+#
+# A pipeline is a list of Stage objects, each a command line with declared
+# input and output paths. A stage depends on every stage that writes one of
+# its inputs (or a file inside an input directory), so the graph is never
+# written out by hand. Independent stages - in particular the per-resolution
+# ones - run concurrently, up to `workers` at a time, each
+# in its own process.
+#
+# A stage is skipped when the manifest (manifest.py) shows its inputs,
+# outputs and command unchanged since it last ran. Every run writes a report
+# with the status, wall time and peak RSS of each stage.
+#
+# Usage: see hepph_pipeline.py
+
+import argparse
+import csv
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from manifest import DEFAULT_MANIFEST, Manifest
+
+DEFAULT_LOG_DIR = 'pipeline_logs'
+DEFAULT_REPORT = 'pipeline_report.csv'
+REPORT_COLUMNS = ['stage', 'status', 'wall_s', 'peak_rss_mb', 'returncode']
+
+
+class Stage:
+    """ One command with the paths it reads and writes """
+
+    def __init__(self, name, cmd, inputs=(), outputs=(), after=(), cwd=None):
+        self.name = name
+        self.cmd = [str(c) for c in cmd]
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.after = list(after)  # extra dependencies not visible from the paths
+        self.cwd = cwd
+
+    def _abs(self, path):
+        return os.path.abspath(os.path.join(self.cwd or '.', path))
+
+    @property
+    def input_paths(self):
+        return [self._abs(p) for p in self.inputs]
+
+    @property
+    def output_paths(self):
+        return [self._abs(p) for p in self.outputs]
+
+    @property
+    def params(self):
+        return {'cmd': self.cmd, 'cwd': self.cwd}
+
+    def __repr__(self):
+        return f"Stage({self.name!r})"
+
+
+def dependencies(stages):
+    """ {stage name: set of stage names it waits for} """
+    names = [s.name for s in stages]
+    if len(set(names)) != len(names):
+        raise ValueError("stage names must be unique")
+    producers = []
+    for stage in stages:
+        producers.extend((path, stage.name) for path in stage.output_paths)
+
+    deps = {}
+    for stage in stages:
+        needed = set(stage.after)
+        for path in stage.input_paths:
+            for out, producer in producers:
+                # An input is produced by a stage writing it or writing into it
+                if producer != stage.name and (out == path or out.startswith(path + os.sep)):
+                    needed.add(producer)
+        unknown = needed - set(names)
+        if unknown:
+            raise ValueError(f"{stage.name} depends on unknown stages {sorted(unknown)}")
+        deps[stage.name] = needed
+    _check_acyclic(deps)
+    return deps
+
+
+def _check_acyclic(deps):
+    state = {}
+
+    def visit(name, path):
+        if state.get(name) == 'done':
+            return
+        if state.get(name) == 'visiting':
+            raise ValueError(f"dependency cycle: {' -> '.join(path + [name])}")
+        state[name] = 'visiting'
+        for dep in deps[name]:
+            visit(dep, path + [name])
+        state[name] = 'done'
+
+    for name in deps:
+        visit(name, [])
+
+
+def run_stage(stage, log_dir):
+    """ Run one stage as a child process; (returncode, wall seconds, peak RSS in MB) """
+    os.makedirs(log_dir, exist_ok=True)
+    for path in stage.output_paths:
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+    start = time.time()
+    with open(os.path.join(log_dir, f"{stage.name}.log"), 'w') as log:
+        proc = subprocess.Popen(stage.cmd, cwd=stage.cwd, stdout=log, stderr=subprocess.STDOUT)
+        # wait4 gives the rusage of this child alone (ru_maxrss is in KB on Linux)
+        _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return proc.returncode, time.time() - start, usage.ru_maxrss / 1024
+
+
+def run_pipeline(stages, workers=1, manifest=None, force=False, log_dir=DEFAULT_LOG_DIR,
+                 report=DEFAULT_REPORT, dry_run=False):
+    """ Run stages in dependency order, up to `workers` at a time; returns the report rows """
+    deps = dependencies(stages)
+    by_name = {s.name: s for s in stages}
+    status = {}
+    rows = []
+    pending = [s.name for s in stages]
+    running = {}
+
+    def finish(name, state, wall=0.0, rss=None, returncode=None):
+        status[name] = state
+        rows.append({'stage': name, 'status': state, 'wall_s': round(wall, 3),
+                     'peak_rss_mb': None if rss is None else round(rss, 1), 'returncode': returncode})
+        extra = f" in {wall:.1f}s, peak RSS {rss:.0f} MB" if rss is not None else ''
+        print(f"[{name}] {state}{extra}")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            for name in list(pending):
+                if any(status.get(d) in ('failed', 'blocked') for d in deps[name]):
+                    pending.remove(name)
+                    finish(name, 'blocked')
+                    continue
+                if not all(status.get(d) in ('ran', 'skipped') for d in deps[name]):
+                    continue
+                if len(running) >= workers:
+                    break
+                stage = by_name[name]
+                pending.remove(name)
+                # Checked only once the upstream stages are done, so an upstream
+                # rerun that rewrote an identical file still lets this stage skip
+                if (not force and manifest and manifest.is_current(
+                        'pipeline', name, stage.input_paths, stage.output_paths, stage.params)):
+                    finish(name, 'skipped')
+                    continue
+                if dry_run:
+                    print(f"[{name}] would run: {' '.join(stage.cmd)}")
+                    status[name] = 'ran'
+                    continue
+                print(f"[{name}] started: {' '.join(stage.cmd)}")
+                running[pool.submit(run_stage, stage, log_dir)] = name
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                stage = by_name[name]
+                try:
+                    returncode, wall, rss = future.result()
+                except OSError as e:
+                    print(f"[{name}] could not start: {e}")
+                    finish(name, 'failed')
+                    continue
+                missing = [p for p in stage.outputs if not os.path.exists(stage._abs(p))]
+                if returncode != 0 or missing:
+                    if missing:
+                        print(f"[{name}] did not write {missing}")
+                    finish(name, 'failed', wall, rss, returncode)
+                    continue
+                if manifest:
+                    manifest.record('pipeline', name, stage.input_paths, stage.output_paths, stage.params)
+                finish(name, 'ran', wall, rss, returncode)
+
+    if report and not dry_run:
+        with open(report, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Stage report saved to {report}")
+    return rows
+
+
+def main(stages, description='Run the pipeline stages.', add_arguments=None):
+    """ Command line shared by pipeline definitions
+
+    add_arguments(parser) adds a pipeline's own options; stages may then be a
+    function of the parsed arguments returning the stage list.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        'only', metavar='stage', type=str, nargs='*',
+        help='run only these stages and what they depend on (default: all)'
+        )
+    parser.add_argument(
+        '-w', metavar='workers', type=int, default=os.cpu_count(),
+        help='stages run concurrently'
+        )
+    parser.add_argument('-m', metavar='manifest', type=str, default=DEFAULT_MANIFEST)
+    parser.add_argument('-l', metavar='log_dir', type=str, default=DEFAULT_LOG_DIR)
+    parser.add_argument('-r', metavar='report', type=str, default=DEFAULT_REPORT)
+    parser.add_argument('--force', action='store_true', help='rerun stages even if up to date')
+    parser.add_argument('--dry-run', action='store_true', help='print what would run')
+    if add_arguments:
+        add_arguments(parser)
+    args = parser.parse_args()
+    if callable(stages):
+        stages = stages(args)
+
+    if args.only:
+        deps = dependencies(stages)
+        wanted, todo = set(), list(args.only)
+        while todo:
+            name = todo.pop()
+            if name not in deps:
+                parser.error(f"unknown stage {name}")
+            if name not in wanted:
+                wanted.add(name)
+                todo.extend(deps[name])
+        stages = [s for s in stages if s.name in wanted]
+
+    rows = run_pipeline(stages, workers=args.w, manifest=Manifest(args.m), force=args.force,
+                        log_dir=args.l, report=args.r, dry_run=args.dry_run)
+    if any(row['status'] in ('failed', 'blocked') for row in rows):
+        sys.exit(1)
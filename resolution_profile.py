@@ -0,0 +1,145 @@
+# CPM resolution profile: instead of clustering a hand-picked grid of
+# resolutions, bisect the CPM resolution range with leidenalg's
+# Optimiser.resolution_profile and keep only the resolutions at which the
+# partition actually changes. Each distinct partition is valid from its
+# resolution up to the next one's (the last one covers only the upper end of
+# the range). Bisection stops at ranges narrower than -e in log space
+# (default 0.05, i.e. within 5% of each other).
+#
+# Writes, for output prefix cit_hepph:
+#   cit_hepph_cpm_<r>.tsv / .npz         one membership per distinct partition,
+#                                        <r> the lowest resolution it covers
+#   cit_hepph_resolution_profile.csv     resolution, resolution_min, resolution_max,
+#                                        n_clusters, bisect_value, quality, path
+#   cit_hepph_resolutions.txt            the discovered resolutions, one per line
+#
+# The resolutions file (or the profile csv), read with
+# resolutions.read_resolutions, replaces the fixed keys list in the
+# downstream stages: hepph_pipeline.py, merge_cluster_stats12.py -R,
+# cluster_quality.py -R, edge_density_plots8.py -R, count_inter_cluster7.py.
+#
+# Usage: python resolution_profile.py -i cit_hepph_store -o cit_hepph -l 0.001 -u 0.2
+
+import argparse
+import os
+import time
+
+import igraph
+import leidenalg
+import numpy as np
+import pandas as pd
+
+from graph_store import is_store, load_graph
+from run_leiden_sweep import SEED, output_path, vertex_ids, write_membership
+
+
+def format_resolution(resolution, digits=4):
+    """ Resolution as a key: positional, `digits` significant digits (0.012345 -> '0.01235') """
+    return np.format_float_positional(resolution, precision=digits, fractional=False, trim='-')
+
+
+def resolution_keys(resolutions, digits=4):
+    """ format_resolution of every resolution, with more digits until the keys are all distinct """
+    keys = [format_resolution(r, digits) for r in resolutions]
+    while len(set(keys)) < len(keys):
+        digits += 1
+        keys = [format_resolution(r, digits) for r in resolutions]
+    return keys
+
+
+def profile_partitions(net, low, high, number_iterations=1, min_diff_bisect_value=1,
+                       min_diff_resolution=0.05, seed=SEED):
+    """ [(partition, resolution_min, resolution_max)] of the distinct CPM partitions over [low, high]
+
+    resolution_profile may hand back the same partition object for several
+    resolutions; each distinct partition is kept once, at the lowest of them.
+    """
+    optimiser = leidenalg.Optimiser()
+    optimiser.set_rng_seed(seed)
+    partitions = optimiser.resolution_profile(
+        net, leidenalg.CPMVertexPartition, resolution_range=(low, high),
+        number_iterations=number_iterations, min_diff_bisect_value=min_diff_bisect_value,
+        min_diff_resolution=min_diff_resolution,
+        )
+    distinct = []
+    for partition in partitions:
+        if not distinct or (partition is not distinct[-1]
+                            and partition.bisect_value() != distinct[-1].bisect_value()):
+            distinct.append(partition)
+    starts = [low] + [p.resolution_parameter for p in distinct[1:]]
+    return list(zip(distinct, starts, starts[1:] + [high]))
+
+
+def run_profile(edge_file, prefix, low, high, number_iterations=1, min_diff_bisect_value=1,
+                min_diff_resolution=0.05):
+    """ Profile edge_file over [low, high], write every distinct partition and the profile tables """
+    start = time.time()
+    if is_store(edge_file):
+        graph = load_graph(edge_file)
+        net = graph.to_igraph(directed=False)
+        node_ids = np.asarray(graph.node_ids, dtype=np.int64)
+    else:
+        net = igraph.Graph.Read_Ncol(edge_file, directed=False)
+        node_ids = vertex_ids(net)
+    print(f"Loaded {edge_file}: {net.vcount()} nodes, {net.ecount()} edges "
+          f"in {time.time() - start:.1f}s")
+
+    start = time.time()
+    profile = profile_partitions(net, low, high, number_iterations, min_diff_bisect_value, min_diff_resolution)
+    print(f"Profiled [{low}, {high}]: {len(profile)} distinct partitions in {time.time() - start:.1f}s")
+
+    keys = resolution_keys([resolution_min for _, resolution_min, _ in profile])
+    rows = []
+    for key, (partition, resolution_min, resolution_max) in zip(keys, profile):
+        path = output_path(prefix, key)
+        write_membership(net, partition.membership, path, node_ids)
+        rows.append({'resolution': key, 'resolution_min': resolution_min, 'resolution_max': resolution_max,
+                     'n_clusters': len(partition), 'bisect_value': partition.bisect_value(),
+                     'quality': partition.quality(), 'path': path})
+        print(f"[{key}] [{resolution_min:.6g}, {resolution_max:.6g}): {len(partition)} clusters -> {path}")
+
+    pd.DataFrame(rows).to_csv(f"{prefix}_resolution_profile.csv", index=False)
+    with open(f"{prefix}_resolutions.txt", 'w') as f:
+        f.writelines(f"{key}\n" for key in keys)
+    return keys
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Find the CPM resolutions at which the Leiden partition changes.'
+        )
+    parser.add_argument(
+        '-i', metavar='ip_net', type=str, required=True,
+        help='input network edge-list path or graph_store directory'
+        )
+    parser.add_argument(
+        '-o', metavar='prefix', type=str, required=True,
+        help='output prefix, e.g. cit_hepph -> cit_hepph_cpm_<r>.tsv, cit_hepph_resolutions.txt'
+        )
+    parser.add_argument(
+        '-l', metavar='low', type=float, default=0.001,
+        help='lowest CPM resolution (default 0.001)'
+        )
+    parser.add_argument(
+        '-u', metavar='high', type=float, default=0.2,
+        help='highest CPM resolution (default 0.2)'
+        )
+    parser.add_argument(
+        '-n', metavar='number_iterations', type=int, default=1,
+        help="leidenalg's number_iterations per resolution (default 1)"
+        )
+    parser.add_argument(
+        '-d', metavar='min_diff_bisect_value', type=float, default=1,
+        help='stop bisecting a range when the bisection values at its ends differ by at most this (default 1)'
+        )
+    parser.add_argument(
+        '-e', metavar='min_diff_resolution', type=float, default=0.05,
+        help='stop bisecting a range narrower than this, in log(high / low) (default 0.05)'
+        )
+    args = parser.parse_args()
+
+    if not 0 < args.l < args.u:
+        parser.error("need 0 < low < high")
+    if os.path.dirname(args.o):
+        os.makedirs(os.path.dirname(args.o), exist_ok=True)
+    run_profile(args.i, args.o, args.l, args.u, args.n, args.d, args.e)
@@ -0,0 +1,57 @@
+# Resolution keys shared by every per-resolution script: the fixed key list,
+# matching a key inside a file name, the membership file of a key, and
+# reading the list that resolution_profile.py writes.
+#
+# A key matches a file name only as a whole resolution, so '0.1' matches
+# output_0.1.csv but not output_0.01.csv, output_0.15.csv or output_0.1357.csv.
+
+import os
+import re
+
+import pandas as pd
+
+keys = ['0.001', '0.005', '0.01', '0.05', '0.1', '0.2', 'modularity']
+
+
+def key_pattern(key):
+    """ Regex matching key as a whole resolution inside a file name """
+    return re.compile(rf'(?<![\d.]){re.escape(key)}(?!\d|\.\d)')
+
+
+def resolution_key(file_name, keys=keys):
+    """ The first of keys that the file name contains as a whole resolution, or None """
+    name = os.path.basename(file_name)
+    for key in keys:
+        if key_pattern(key).search(name):
+            return key
+    return None
+
+
+def find_file(file_names, key, extensions=('.csv', '.tsv')):
+    """ First file name (sorted) with one of extensions that contains key as a whole resolution, or None """
+    pattern = key_pattern(key)
+    matches = sorted(f for f in file_names if f.endswith(extensions) and pattern.search(os.path.basename(f)))
+    return matches[0] if matches else None
+
+
+def membership_path(prefix, key):
+    """ Membership file that run_leiden_sweep.py / resolution_profile.py write for key, e.g. cit_hepph_cpm_0.01.tsv """
+    if key == 'modularity':
+        return f"{prefix}_modularity.tsv"
+    return f"{prefix}_cpm_{key}.tsv"
+
+
+def read_resolutions(path):
+    """ Resolution keys from a resolution_profile.py resolutions .txt (one per line) or profile .csv """
+    if path.endswith('.csv'):
+        return pd.read_csv(path, dtype={'resolution': str})['resolution'].tolist()
+    with open(path) as f:
+        return [line.split('#')[0].strip() for line in f if line.split('#')[0].strip()]
+
+
+def selected_keys(resolutions_file=None, extra_keys=None):
+    """ Keys for a -R / -k command line: the resolutions file's keys followed by extra_keys,
+    or without a resolutions file extra_keys, or the fixed list """
+    if resolutions_file is None:
+        return list(extra_keys or keys)
+    return read_resolutions(resolutions_file) + list(extra_keys or [])
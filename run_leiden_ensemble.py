@@ -0,0 +1,205 @@
+# Multi-seed ensemble version of run_leiden_sweep.py: runs every resolution
+# with n_seeds seeds (1234, 1235, ...) in forked worker processes that share
+# the loaded graph, then writes a consensus membership and stability scores.
+#
+# Co-assignment is only ever evaluated on pairs that matter, never as an
+# n x n matrix:
+#   - per edge, the fraction of seeds that put both endpoints in one cluster.
+#     As in Lancichinetti & Fortunato's consensus clustering, the edges at or
+#     above -t (default 0.5, i.e. co-clustered by a majority of seeds) are
+#     re-clustered once more at the same resolution, weighted by that
+#     fraction, to give the consensus membership. (Connected components of
+#     those edges chain most of the graph into one cluster.)
+#   - per node, the fraction of the other members of its consensus cluster
+#     it shares a cluster with, averaged over seeds; from the contingency
+#     counts of consensus cluster x seed cluster
+#   - per cluster, the mean node stability, which equals the fraction of the
+#     cluster's node pairs that co-cluster, averaged over seeds
+# Singleton consensus clusters have no pairs and get NaN stability.
+#
+# Writes, per resolution:
+#   cit_hepph_consensus_cpm_0.01.tsv / .npz   consensus membership (see write_membership)
+# and into the stability directory (-d, default cit_hepph_stability/):
+#   consensus_cpm_0.01_node_stability.csv     node_id, cluster_id, stability
+#   consensus_cpm_0.01_cluster_stability.csv  cluster_id, nodes_in_cluster, stability
+#   consensus_cpm_0.01_seeds.npz              node_ids and the (n_nodes, n_seeds) memberships
+#   seed1234_cpm_0.01_*_stability.csv         the same two tables for the seed 1234 run alone
+# The stability tables are kept out of the membership directory because
+# their names contain the resolution, which the per-key file pickers
+# (summary_cluster_edges3_w_intercluster6.py, count_inter_cluster7.py) match.
+#
+# Usage: python run_leiden_ensemble.py -i cit_hepph_store -o cit_hepph -r 0.01 0.1 -n 2 -s 10 -w 4
+
+import argparse
+import multiprocessing
+import os
+import time
+
+import igraph
+import numpy as np
+import pandas as pd
+
+from graph_store import is_store, load_graph
+from run_leiden_sweep import SEED, find_partition, output_path, vertex_ids, write_membership
+
+# Graph shared with forked workers; set before the pool is created
+_net = None
+
+
+def _run_seed(job):
+    """ Worker: cluster the shared graph at one resolution with one seed """
+    resolution, n_iterations, seed = job
+    start = time.time()
+    partition, _ = find_partition(_net, resolution, n_iterations, seed=seed)
+    return resolution, seed, np.asarray(partition.membership, dtype=np.int32), time.time() - start
+
+
+def edge_coassignment(src, dst, memberships):
+    """ Fraction of the memberships' columns in which each edge's endpoints share a cluster """
+    same = np.zeros(len(src), dtype=np.int32)
+    for s in range(memberships.shape[1]):
+        column = memberships[:, s]
+        same += column[src] == column[dst]
+    return same / memberships.shape[1]
+
+
+def consensus_membership(n_nodes, src, dst, coassignment, resolution, n_iterations, threshold=0.5):
+    """ Leiden on the edges co-clustered in at least `threshold` of the seeds, weighted by co-assignment """
+    keep = coassignment >= threshold
+    graph = igraph.Graph(n=n_nodes, edges=np.column_stack([src[keep], dst[keep]]).tolist())
+    partition, _ = find_partition(graph, resolution, n_iterations, weights=coassignment[keep].tolist())
+    return np.asarray(partition.membership, dtype=np.int64)
+
+
+def node_stability(consensus, memberships):
+    """ Per node, the mean over seeds of the share of its consensus cluster it co-clusters with """
+    sizes = np.bincount(consensus)[consensus]
+    total = np.zeros(len(consensus))
+    for s in range(memberships.shape[1]):
+        # Contingency counts of (consensus cluster, seed cluster), looked up per node
+        pairs = consensus.astype(np.int64) * (int(memberships[:, s].max()) + 1) + memberships[:, s]
+        _, inverse, counts = np.unique(pairs, return_inverse=True, return_counts=True)
+        total += counts[inverse] - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(sizes > 1, total / (memberships.shape[1] * (sizes - 1)), np.nan)
+
+
+def cluster_stability(consensus, stability):
+    """ cluster_id, nodes_in_cluster and mean node stability of every consensus cluster """
+    sizes = np.bincount(consensus)
+    with np.errstate(invalid='ignore'):
+        mean = np.bincount(consensus, weights=np.nan_to_num(stability)) / sizes
+    mean[sizes < 2] = np.nan
+    return pd.DataFrame({'cluster_id': np.arange(len(sizes)), 'nodes_in_cluster': sizes, 'stability': mean})
+
+
+def write_stability(stem, node_ids, membership, memberships):
+    """ Node and cluster stability of membership against the seeds, as <stem>_*_stability.csv """
+    stability = node_stability(membership, memberships)
+    pd.DataFrame({'node_id': node_ids, 'cluster_id': membership, 'stability': stability}).to_csv(
+        f"{stem}_node_stability.csv", index=False)
+    cluster_stability(membership, stability).to_csv(f"{stem}_cluster_stability.csv", index=False)
+    return stability
+
+
+def summarize(resolution, memberships, node_ids, src, dst, prefix, stability_dir, n_iterations, threshold=0.5):
+    """ Write the consensus membership, stability tables and seed memberships of one resolution """
+    coassignment = edge_coassignment(src, dst, memberships)
+    consensus = consensus_membership(len(node_ids), src, dst, coassignment, resolution, n_iterations, threshold)
+
+    path = output_path(f"{prefix}_consensus", resolution)
+    write_membership(_net, consensus, path, node_ids)
+    stem = os.path.join(stability_dir, output_path('consensus', resolution)[:-len('.tsv')])
+    stability = write_stability(stem, node_ids, consensus, memberships)
+    np.savez(f"{stem}_seeds.npz", node_ids=node_ids, memberships=memberships)
+    # stability of the first seed's clusters alone, for comparison with the consensus
+    seed_stem = os.path.join(stability_dir, output_path(f"seed{SEED}", resolution)[:-len('.tsv')])
+    seed_stability = write_stability(seed_stem, node_ids, memberships[:, 0].astype(np.int64), memberships)
+
+    print(f"[{resolution}] consensus: {consensus.max() + 1} clusters, "
+          f"{(coassignment >= threshold).mean():.1%} of edges co-clustered by >= {threshold:.0%} of seeds, "
+          f"mean node stability {np.nanmean(stability):.3f} (seed {SEED}: {np.nanmean(seed_stability):.3f}) "
+          f"-> {path}")
+    return path
+
+
+def run_ensemble(edge_file, resolutions, n_iterations, prefix, n_seeds=10, workers=1, threshold=0.5,
+                 stability_dir=None):
+    """ Load edge_file once, run every resolution with n_seeds seeds and summarize each
+
+    Stability tables go to stability_dir, by default <prefix>_stability.
+    """
+    global _net
+    start = time.time()
+    if is_store(edge_file):
+        graph = load_graph(edge_file)
+        _net = graph.to_igraph(directed=False)
+        node_ids = np.asarray(graph.node_ids, dtype=np.int64)
+    else:
+        _net = igraph.Graph.Read_Ncol(edge_file, directed=False)
+        node_ids = vertex_ids(_net)
+    print(f"Loaded {edge_file}: {_net.vcount()} nodes, {_net.ecount()} edges "
+          f"in {time.time() - start:.1f}s")
+    edges = np.array(_net.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+    src, dst = edges[:, 0], edges[:, 1]
+
+    seeds = [SEED + i for i in range(n_seeds)]
+    jobs = [(r, n_iterations, seed) for r in resolutions for seed in seeds]
+    if workers > 1:
+        # fork so every worker sees the already-loaded graph without re-reading it
+        ctx = multiprocessing.get_context('fork')
+        with ctx.Pool(min(workers, len(jobs))) as pool:
+            results = pool.map(_run_seed, jobs)
+    else:
+        results = [_run_seed(job) for job in jobs]
+
+    stability_dir = stability_dir or f"{prefix}_stability"
+    os.makedirs(stability_dir, exist_ok=True)
+    memberships = {r: np.empty((len(node_ids), n_seeds), dtype=np.int32) for r in resolutions}
+    for resolution, seed, membership, seconds in results:
+        memberships[resolution][:, seed - SEED] = membership
+        print(f"[{resolution}] seed {seed}: {membership.max() + 1} clusters in {seconds:.1f}s")
+    return [summarize(r, memberships[r], node_ids, src, dst, prefix, stability_dir, n_iterations, threshold)
+            for r in resolutions]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Run leiden with several seeds per resolution and write consensus and stability.'
+        )
+    parser.add_argument(
+        '-i', metavar='ip_net', type=str, required=True,
+        help='input network edge-list path or graph_store directory'
+        )
+    parser.add_argument(
+        '-o', metavar='prefix', type=str, required=True,
+        help='output prefix, e.g. cit_hepph -> cit_hepph_consensus_cpm_<r>.tsv'
+        )
+    parser.add_argument(
+        '-r', metavar='resolution', type=str, nargs='+', required=True,
+        help="CPM resolutions and/or 'modularity'"
+        )
+    parser.add_argument(
+        '-n', metavar='n_iterations', type=int, required=True,
+        help='number of iterations'
+        )
+    parser.add_argument(
+        '-s', metavar='n_seeds', type=int, default=10,
+        help='seeds per resolution, starting at 1234 (default 10)'
+        )
+    parser.add_argument(
+        '-w', metavar='workers', type=int, default=1,
+        help='number of worker processes (default 1, sequential)'
+        )
+    parser.add_argument(
+        '-t', metavar='threshold', type=float, default=0.5,
+        help='share of seeds that must co-cluster an edge for it to enter the consensus graph (default 0.5)'
+        )
+    parser.add_argument(
+        '-d', metavar='stability_dir', type=str, default=None,
+        help='directory for the stability tables and seed memberships (default <prefix>_stability)'
+        )
+    args = parser.parse_args()
+
+    run_ensemble(args.i, args.r, args.n, args.o, n_seeds=args.s, workers=args.w, threshold=args.t,
+                 stability_dir=args.d)
@@ -14,7 +14,6 @@
 # Define the network file path
 NETWORK_FILE="/projects/illinois/eng/shared/shared/CS598GCK-SP25/assig2_networks/cit_hepph_cleaned.tsv"
 
-python run_leiden.py -i $NETWORK_FILE -r 0.005 -n 2 -o cit_heph_cpm_0.005.tsv
-python run_leiden.py -i $NETWORK_FILE -r 0.05 -n 2 -o cit_heph_cpm_0.05.tsv
-python run_leiden.py -i $NETWORK_FILE -r 0.2 -n 2 -o cit_heph_cpm_0.2.tsv
-# python run_leiden_modularity.py -i $NETWORK_FILE -n 2 -o cit_heph_modularity.tsv
+# Load the graph once and run every resolution against it (one worker per core);
+# resubmitting after a timeout resumes each resolution from its checkpoint
+python run_leiden_sweep.py -i $NETWORK_FILE -r 0.005 0.05 0.2 -n 2 -w 2 -c checkpoints -o cit_hepph
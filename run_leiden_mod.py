@@ -1,10 +1,15 @@
 # modification of syt3's run_leiden.py that
 # sets n_iterations to 5 and seed to 1234
 # 2/19/2023
+# -c checkpoints every iteration and resumes after a restart, -t stops early
+# (see run_leiden_sweep.py); the membership is also written as a binary .npz
 
-import leidenalg
 import igraph
 import argparse
+import os
+
+from graph_store import is_store, load_graph
+from run_leiden_sweep import MODULARITY, find_partition, write_membership
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Script for running leiden.')
@@ -13,7 +18,7 @@ if __name__ == "__main__":
     #  "number of iterations" and "-n" is the input file
     parser.add_argument(
         '-i', metavar='ip_net', type=str, required=True,
-        help='input network edge-list path'
+        help='input network edge-list path or graph_store directory'
         )
     parser.add_argument(
         '-o', metavar='output', type=str, required=True,
@@ -23,13 +28,23 @@ if __name__ == "__main__":
         '-n', metavar='n_iterations', type=int, required=True,
         help='number of iterations'
         )
+    parser.add_argument(
+        '-c', metavar='checkpoint', type=str, default=None,
+        help='checkpoint file written after every iteration and resumed from on restart'
+        )
+    parser.add_argument(
+        '-t', metavar='tol', type=float, default=None,
+        help='stop once an iteration improves quality by less than tol * |quality|'
+        )
     args = parser.parse_args()
 
-    net = igraph.Graph.Read_Ncol(args.i, directed=False)
-    partition = leidenalg.find_partition(
-        net, leidenalg.ModularityVertexPartition,
-        seed=1234, n_iterations=args.n
-        )
-    with open(args.o, "w") as f:
-        for n, m in enumerate(partition.membership):
-            f.write(f"{net.vs[n]['name']}\t{m}\n")
+    if is_store(args.i):
+        net = load_graph(args.i).to_igraph(directed=False)
+    else:
+        net = igraph.Graph.Read_Ncol(args.i, directed=False)
+    # same partition as leidenalg.find_partition(..., seed=1234, n_iterations=args.n)
+    partition, iterations = find_partition(net, MODULARITY, args.n, checkpoint=args.c, tol=args.t)
+    write_membership(net, partition.membership, args.o)
+    if args.c:
+        os.remove(args.c)
+    print(f"{len(partition)} clusters after {iterations} iterations")
@@ -14,6 +14,6 @@
 # Define the network file path
 NETWORK_FILE="/projects/illinois/eng/shared/shared/CS598GCK-SP25/assig2_networks/cit_patents_cleaned.tsv"
 
-python run_leiden.py -i $NETWORK_FILE -r 0.001 -n 2 -o cit_patents_cpm_0.001.tsv
-python run_leiden.py -i $NETWORK_FILE -r 0.01 -n 2 -o cit_patents_cpm_0.01.tsv
-python run_leiden_modularity.py -i $NETWORK_FILE -n 2 -o cit_patents_modularity.tsv
\ No newline at end of file
+# Load the graph once and run every resolution against it (one worker per core);
+# resubmitting after a timeout resumes each resolution from its checkpoint
+python run_leiden_sweep.py -i $NETWORK_FILE -r 0.001 0.01 modularity -n 2 -w 2 -c checkpoints -o cit_patents
\ No newline at end of file
@@ -0,0 +1,350 @@
+# multi-resolution version of run_leiden_mod.py: reads the edge list once
+# and runs every requested resolution (CPM values and/or modularity) against
+# the same igraph graph, with n_iterations and seed=1234 as before.
+# Resolutions can run in forked worker processes that share the graph.
+#
+# With --warm the CPM resolutions run in order from the highest to the lowest
+# and each run starts from the previous resolution's membership instead of
+# singletons (modularity still starts cold). Every run reports its iteration
+# count and wall time; -n -1 iterates until an iteration brings no
+# improvement, which is where warm starts save the most.
+#
+# With -c every run saves its membership and quality to a checkpoint after
+# each iteration and a restarted job resumes from there, so a run killed at
+# the end of a SLURM window keeps its progress; a checkpoint saved with
+# another -n, seed or warm-start source is ignored. -t stops a run early once an
+# iteration improves quality by less than the given fraction.
+#
+# Every membership is written as the usual node/cluster TSV plus the same
+# pairs as int64 arrays in a .npz next to it (cit_hepph_cpm_0.01.npz), which
+# cluster_edges.load_membership picks up instead of parsing the text.
+
+import argparse
+import csv
+import multiprocessing
+import os
+import time
+
+import igraph
+import leidenalg
+import numpy as np
+import pandas as pd
+
+from cluster_edges import (MISSING, binary_membership_path, load_membership, lookup_clusters,
+                           save_membership)
+from graph_store import is_store, load_graph
+from manifest import Manifest
+from resolutions import membership_path as output_path
+
+SEED = 1234
+MODULARITY = 'modularity'
+
+# Graph and its vertices' original node ids, shared with forked workers;
+# set before the pool is created
+_net = None
+_node_ids = None
+
+
+def new_partition(net, resolution, initial_membership=None, weights=None):
+    """ Modularity or CPM partition of net, from singletons or initial_membership """
+    if resolution == MODULARITY:
+        return leidenalg.ModularityVertexPartition(net, initial_membership=initial_membership, weights=weights)
+    return leidenalg.CPMVertexPartition(
+        net, initial_membership=initial_membership, weights=weights, resolution_parameter=float(resolution)
+        )
+
+
+def run_settings(resolution, n_iterations, seed=SEED, seeded_from=None):
+    """ What a checkpoint has to match to be resumed: resolution, n_iterations, seed, warm-start source """
+    return {'resolution': str(resolution), 'n_iterations': int(n_iterations), 'seed': int(seed),
+            'seeded_from': '' if seeded_from is None else str(seeded_from)}
+
+
+def save_checkpoint(path, partition, iterations, settings):
+    """ Atomically write the partition's membership and quality after `iterations` iterations """
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, membership=np.asarray(partition.membership, dtype=np.int64),
+                 quality=partition.quality(), iterations=iterations, **settings)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path, net, settings):
+    """ (membership, iterations) saved for this graph and these run_settings, or None """
+    if not path or not os.path.exists(path):
+        return None
+    resolution = settings['resolution']
+    with np.load(path) as ckpt:
+        changed = [k for k, v in settings.items() if k not in ckpt.files or type(v)(ckpt[k]) != v]
+        if len(ckpt['membership']) != net.vcount():
+            changed.append('graph')
+        if changed:
+            print(f"[{resolution}] checkpoint {path} is for another run ({', '.join(changed)} changed), ignoring it")
+            return None
+        print(f"[{resolution}] resuming from {path}: {int(ckpt['iterations'])} iterations, "
+              f"quality {float(ckpt['quality'])}")
+        return ckpt['membership'].tolist(), int(ckpt['iterations'])
+
+
+def optimise(partition, n_iterations, seed=SEED, done=0, checkpoint=None, resolution=None, tol=None,
+             seeded_from=None):
+    """ Run Leiden iterations on partition one at a time; returns the number run (including done)
+
+    Same iterations and random stream as leidenalg.find_partition: n_iterations
+    of them, or with a negative n_iterations until one brings no improvement.
+    done counts iterations already run by a resumed checkpoint; the optimiser
+    is then seeded with seed + done, so a resumed run is reproducible but not
+    identical to an uninterrupted one. With a checkpoint path the membership
+    and quality are saved after every iteration, together with the
+    run_settings a resume has to match. With tol, iterations also
+    stop once one improves quality by less than tol * |quality|.
+    """
+    settings = run_settings(resolution, n_iterations, seed, seeded_from)
+    optimiser = leidenalg.Optimiser()
+    optimiser.set_rng_seed(seed + done)
+    iterations = done
+    # like find_partition, a fresh run always does at least one iteration
+    while iterations == 0 or n_iterations < 0 or iterations < n_iterations:
+        diff = optimiser.optimise_partition(partition, n_iterations=1)
+        iterations += 1
+        if checkpoint:
+            save_checkpoint(checkpoint, partition, iterations, settings)
+        if diff <= 0 and n_iterations < 0:
+            break
+        if tol is not None and diff < tol * abs(partition.quality()):
+            print(f"[{resolution}] iteration {iterations} improved quality by {diff:.6g}, stopping")
+            break
+    return iterations
+
+
+def find_partition(net, resolution, n_iterations, seed=SEED, initial_membership=None,
+                   checkpoint=None, tol=None, weights=None, seeded_from=None):
+    """ Run Leiden with modularity or with CPM at the given resolution; (partition, iterations)
+
+    With a checkpoint path an interrupted run resumes from the last saved
+    iteration, unless that checkpoint was saved with another n_iterations,
+    seed or warm start; seeded_from names the run initial_membership came
+    from. The caller removes the checkpoint once the run is written.
+    """
+    if initial_membership is not None and seeded_from is None:
+        seeded_from = 'initial_membership'
+    done = 0
+    resumed = load_checkpoint(checkpoint, net, run_settings(resolution, n_iterations, seed, seeded_from))
+    if resumed:
+        initial_membership, done = resumed
+    partition = new_partition(net, resolution, initial_membership, weights)
+    iterations = optimise(partition, n_iterations, seed, done=done, checkpoint=checkpoint,
+                          resolution=resolution, tol=tol, seeded_from=seeded_from)
+    return partition, iterations
+
+
+def checkpoint_path(checkpoint_dir, path):
+    """ Checkpoint file for a membership output, or None without a checkpoint_dir """
+    if not checkpoint_dir:
+        return None
+    return os.path.join(checkpoint_dir, os.path.basename(path) + '.ckpt.npz')
+
+
+def vertex_ids(net):
+    """ int64 original node id of every vertex, from the 'name' attribute """
+    return np.asarray(net.vs['name']).astype(np.int64)
+
+
+def write_membership(net, membership, path, nodes=None):
+    """ Write node id / cluster id pairs as a headerless TSV and as a binary .npz next to it
+
+    Both are written in bulk from arrays; nodes are net's vertex_ids unless
+    passed in. Readers go through cluster_edges.load_membership.
+    """
+    if nodes is None:
+        nodes = vertex_ids(net)
+    clusters = np.asarray(membership, dtype=np.int64)
+    pd.DataFrame({'node': nodes, 'cluster': clusters}).to_csv(path, sep='\t', header=False, index=False)
+    save_membership(binary_membership_path(path), nodes, clusters)
+
+
+def _run_resolution(job):
+    """ Worker: cluster the shared graph at one resolution and write it """
+    resolution, n_iterations, path, initial_membership, seeded_from, checkpoint, tol = job
+    start = time.time()
+    partition, iterations = find_partition(_net, resolution, n_iterations,
+                                           initial_membership=initial_membership,
+                                           checkpoint=checkpoint, tol=tol, seeded_from=seeded_from)
+    write_membership(_net, partition.membership, path, _node_ids)
+    if checkpoint:
+        os.remove(checkpoint)
+    return {'resolution': resolution, 'path': path, 'n_clusters': len(partition),
+            'iterations': iterations, 'quality': partition.quality(),
+            'seconds': time.time() - start, 'membership': partition.membership}
+
+
+def warm_order(resolutions):
+    """ CPM resolutions from highest to lowest, then modularity """
+    cpm = sorted((r for r in resolutions if r != MODULARITY), key=float, reverse=True)
+    return cpm + [r for r in resolutions if r == MODULARITY]
+
+
+def read_membership(node_ids, path):
+    """ Membership list over the vertices with these node ids, from a written membership file """
+    membership = lookup_clusters(node_ids, *load_membership(path))
+    # nodes missing from the file start as singletons
+    missing = membership == MISSING
+    membership[missing] = membership.max(initial=-1) + 1 + np.arange(missing.sum())
+    return membership.tolist()
+
+
+def write_report(results, path):
+    """ One row per resolution run: seeded_from, iterations, clusters, quality, seconds """
+    fields = ['resolution', 'seeded_from', 'iterations', 'n_clusters', 'quality', 'seconds', 'path']
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def _report(result, manifest, edge_file, inputs, params):
+    print(f"[{result['resolution']}] {result['n_clusters']} clusters, {result['iterations']} iterations "
+          f"(from {result['seeded_from'] or 'singletons'}) in {result['seconds']:.1f}s -> {result['path']}")
+    if manifest:
+        manifest.record('leiden', result['resolution'], [edge_file] + inputs, [result['path']], params)
+
+
+def run_sweep(edge_file, resolutions, n_iterations, prefix, workers=1, manifest=None, warm=False,
+              checkpoint_dir=None, tol=None):
+    """ Load edge_file once and cluster it at every resolution
+
+    With a manifest, resolutions whose graph, parameters and membership file
+    are unchanged since they were last recorded are skipped. With warm, the
+    CPM resolutions run sequentially from the highest to the lowest, each
+    seeded with the previous resolution's membership (a skipped resolution's
+    membership is read back from its file). With a checkpoint_dir every run
+    checkpoints each iteration there and resumes from it after a restart.
+    """
+    global _net, _node_ids
+    if warm:
+        resolutions = warm_order(resolutions)
+    # CPM resolution each run is seeded from (None: cold start from singletons)
+    seeds = {r: None for r in resolutions}
+    if warm:
+        cpm = [r for r in resolutions if r != MODULARITY]
+        seeds.update(zip(cpm[1:], cpm[:-1]))
+    params = {r: {'n_iterations': n_iterations, 'seed': SEED, 'warm': seeds[r], 'tol': tol} for r in resolutions}
+    inputs = {r: [output_path(prefix, seeds[r])] if seeds[r] else [] for r in resolutions}
+    todo = resolutions
+    if manifest:
+        # a warm run is stale when the run it is seeded from is
+        todo = []
+        for r in resolutions:
+            if seeds[r] in todo or not manifest.is_current(
+                    'leiden', r, [edge_file] + inputs[r], [output_path(prefix, r)], params[r]):
+                todo.append(r)
+            else:
+                print(f"[{r}] inputs unchanged, reusing {output_path(prefix, r)}")
+        if not todo:
+            return []
+
+    start = time.time()
+    if is_store(edge_file):
+        graph = load_graph(edge_file)
+        _net = graph.to_igraph(directed=False)
+        _node_ids = np.asarray(graph.node_ids, dtype=np.int64)
+    else:
+        _net = igraph.Graph.Read_Ncol(edge_file, directed=False)
+        _node_ids = vertex_ids(_net)
+    print(f"Loaded {edge_file}: {_net.vcount()} nodes, {_net.ecount()} edges "
+          f"in {time.time() - start:.1f}s")
+
+    if checkpoint_dir:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    def job(r, initial_membership=None, seeded_from=None):
+        path = output_path(prefix, r)
+        return r, n_iterations, path, initial_membership, seeded_from, checkpoint_path(checkpoint_dir, path), tol
+
+    results = []
+    if warm:
+        # each CPM run needs the one before it, so they run in order
+        cold = [r for r in todo if r == MODULARITY]
+        memberships = {}
+        for r in todo:
+            if r in cold:
+                continue
+            seed = seeds[r]
+            if seed is not None and seed not in memberships:
+                memberships[seed] = read_membership(_node_ids, output_path(prefix, seed))
+            result = _run_resolution(job(r, memberships.get(seed), seed))
+            memberships[r] = result.pop('membership')
+            result['seeded_from'] = seed
+            _report(result, manifest, edge_file, inputs[r], params[r])
+            results.append(result)
+        todo = cold
+
+    jobs = [job(r) for r in todo]
+    if workers > 1 and len(jobs) > 1:
+        # fork so every worker sees the already-loaded graph without re-reading it
+        ctx = multiprocessing.get_context('fork')
+        with ctx.Pool(min(workers, len(jobs))) as pool:
+            cold_results = pool.map(_run_resolution, jobs)
+    else:
+        cold_results = [_run_resolution(job) for job in jobs]
+    for result in cold_results:
+        del result['membership']
+        result['seeded_from'] = None
+        _report(result, manifest, edge_file, inputs[result['resolution']], params[result['resolution']])
+        results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Run leiden at several resolutions on one loaded graph.'
+        )
+    parser.add_argument(
+        '-i', metavar='ip_net', type=str, required=True,
+        help='input network edge-list path or graph_store directory'
+        )
+    parser.add_argument(
+        '-o', metavar='prefix', type=str, required=True,
+        help='output prefix, e.g. cit_hepph -> cit_hepph_cpm_<r>.tsv'
+        )
+    parser.add_argument(
+        '-r', metavar='resolution', type=str, nargs='+', required=True,
+        help="CPM resolutions and/or 'modularity'"
+        )
+    parser.add_argument(
+        '-n', metavar='n_iterations', type=int, required=True,
+        help='number of iterations'
+        )
+    parser.add_argument(
+        '-w', metavar='workers', type=int, default=1,
+        help='number of worker processes (default 1, sequential)'
+        )
+    parser.add_argument(
+        '-m', metavar='manifest', type=str, default=None,
+        help='content-hash manifest; resolutions whose inputs are unchanged are skipped'
+        )
+    parser.add_argument(
+        '--warm', action='store_true',
+        help='run CPM resolutions from high to low, each starting from the previous membership'
+        )
+    parser.add_argument(
+        '--report', metavar='report_csv', type=str, default=None,
+        help='write per-resolution iterations and wall time to this csv'
+        )
+    parser.add_argument(
+        '-c', metavar='checkpoint_dir', type=str, default=None,
+        help='checkpoint every iteration here and resume from it after a restart'
+        )
+    parser.add_argument(
+        '-t', metavar='tol', type=float, default=None,
+        help='stop once an iteration improves quality by less than tol * |quality|'
+        )
+    args = parser.parse_args()
+
+    if os.path.dirname(args.o):
+        os.makedirs(os.path.dirname(args.o), exist_ok=True)
+    manifest = Manifest(args.m) if args.m else None
+    results = run_sweep(args.i, args.r, args.n, args.o, workers=args.w, manifest=manifest, warm=args.warm,
+                        checkpoint_dir=args.c, tol=args.t)
+    if args.report:
+        write_report(results, args.report)
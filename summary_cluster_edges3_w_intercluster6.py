@@ -1,97 +1,89 @@
+import argparse
 import os
 import pandas as pd
-from collections import defaultdict
+
+from cluster_edges import cluster_edge_table, stream_cluster_edge_table
+from resolutions import find_file, selected_keys
 
 # Define directories
 cluster_dir = "clusters/"
-edge_dir = "cluster_edges_remaining/"
+edge_dir = "cluster_edges_remaining/"  # or a single edge file used for every key
 output_dir = "path/"  # Directory to save results
-os.makedirs(output_dir, exist_ok=True)
 
-# Keys to filter files
-keys = ['0.001', '0.005', '0.01', '0.05', '0.1', '0.2', 'modularity']
+# Edges per chunk when streaming the edge file (e.g. 5_000_000 for cit-Patents);
+# None loads each edge file whole
+chunksize = None
 
 def read_file(file_path):
     """ Read a TSV file (tab-separated values) """
     return pd.read_csv(file_path, sep='\t', header=None)  # No header as your file does not have headers
 
 def load_clusters(cluster_file_path):
-    """ Load cluster file and return a mapping from node to cluster """
+    """ Load cluster file as a 'node'/'cluster' DataFrame """
     df = read_file(cluster_file_path)
     print("Columns in the cluster file:", df.columns)  # Print column names to inspect
     
     # Manually set column names as 'node' and 'cluster'
     df.columns = ['node', 'cluster']
-    
-    # Ensure 'node' column exists
-    if 'node' not in df.columns:
-        print(f"Error: 'node' column not found in {cluster_file_path}")
-        return {}, {}  # Return empty dictionaries if 'node' column is missing
+    return df
 
-    cluster_map = df.set_index('node')['cluster'].to_dict()
-    
-    # Count number of nodes in each cluster
-    node_counts = df['cluster'].value_counts().to_dict()
-    
-    return cluster_map, node_counts
+def count_edges_per_cluster(edge_file, clusters_df):
+    """ Count nodes, intracluster and intercluster edges per cluster in one columnar pass """
+    nodes = clusters_df['node'].to_numpy()
+    clusters = clusters_df['cluster'].to_numpy()
+
+    # Only edges with both endpoints clustered are counted; an intercluster
+    # edge counts once for each of its two clusters
+    if chunksize:
+        # Stream the edge file so peak memory does not grow with the edge count
+        reader = pd.read_csv(edge_file, sep='\t', header=None, usecols=[0, 1], chunksize=chunksize)
+        chunks = ((chunk[0].to_numpy(), chunk[1].to_numpy()) for chunk in reader)
+        return stream_cluster_edge_table(chunks, nodes, clusters)
 
-def count_edges_per_cluster(edge_file, cluster_map):
-    """ Count both intracluster and intercluster edges """
     df = read_file(edge_file)
-    df.columns = df.columns[:2]  # Ensure that columns are 'u' and 'v' for the nodes
+    df = df.iloc[:, :2]
     df.columns = ['u', 'v']
-    
-    edge_counts_intra = defaultdict(int)  # Intra-cluster edges
-    edge_counts_inter = defaultdict(int)  # Inter-cluster edges
-
-    for _, row in df.iterrows():
-        u, v = row['u'], row['v']
-        if u in cluster_map and v in cluster_map:
-            cu, cv = cluster_map[u], cluster_map[v]
-            
-            # Intracluster edge
-            if cu == cv:
-                edge_counts_intra[cu] += 1
-            else:
-                # Intercluster edge, increment for both clusters
-                edge_counts_inter[cu] += 1
-                edge_counts_inter[cv] += 1
-
-    return edge_counts_intra, edge_counts_inter
+    return cluster_edge_table(df['u'].to_numpy(), df['v'].to_numpy(), nodes, clusters)
 
-# Main loop to process files
-for key in keys:
-    cluster_files = [f for f in os.listdir(cluster_dir) if key in f and f.endswith(('.csv', '.tsv'))]
-    edge_files = [f for f in os.listdir(edge_dir) if key in f and f.endswith(('.csv', '.tsv'))]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Nodes, intra- and inter-cluster edges per cluster for every key.')
+    parser.add_argument('-c', metavar='cluster_dir', type=str, default=cluster_dir)
+    parser.add_argument('-e', metavar='edge_dir', type=str, default=edge_dir,
+                        help='directory of per-key edge files, or one edge file for every key')
+    parser.add_argument('-o', metavar='output_dir', type=str, default=output_dir)
+    parser.add_argument('-k', metavar='key', type=str, nargs='+', default=None,
+                        help='resolution keys (default: the fixed list)')
+    parser.add_argument('-R', metavar='resolutions_file', type=str, default=None,
+                        help='keys from resolution_profile.py output, followed by any -k keys')
+    args = parser.parse_args()
+    args.k = selected_keys(args.R, args.k)
+    os.makedirs(args.o, exist_ok=True)
 
-    if not cluster_files or not edge_files:
-        print(f"[{key}] No matching files found.")
-        continue
+    # Main loop to process files (whole resolutions only: '0.1' does not match '0.01')
+    cluster_names = os.listdir(args.c)
+    edge_names = None if os.path.isfile(args.e) else os.listdir(args.e)
+    for key in args.k:
+        cluster_file = find_file(cluster_names, key)
+        edge_file_path = args.e if edge_names is None else find_file(edge_names, key)
 
-    # Select the first matching cluster and edge file
-    cluster_file_path = os.path.join(cluster_dir, cluster_files[0])
-    edge_file_path = os.path.join(edge_dir, edge_files[0])
+        if not cluster_file or not edge_file_path:
+            print(f"[{key}] No matching files found.")
+            continue
 
-    # Load cluster data and edge counts
-    cluster_map, node_counts = load_clusters(cluster_file_path)
-    if not cluster_map:  # Skip if cluster map is empty due to error
-        continue
-    edge_counts_intra, edge_counts_inter = count_edges_per_cluster(edge_file_path, cluster_map)
+        # Select the first matching cluster and edge file
+        cluster_file_path = os.path.join(args.c, cluster_file)
+        if edge_names is not None:
+            edge_file_path = os.path.join(args.e, edge_file_path)
 
-    # Merge cluster stats
-    all_cluster_ids = set(node_counts.keys()) | set(edge_counts_intra.keys()) | set(edge_counts_inter.keys())
-    data = []
-    for cid in sorted(all_cluster_ids):
-        data.append({
-            'cluster_id': cid,
-            'nodes_in_cluster': node_counts.get(cid, 0),
-            'intra_cluster_edges': edge_counts_intra.get(cid, 0),
-            'inter_cluster_edges': edge_counts_inter.get(cid, 0)
-        })
+        # Load cluster data, then node and edge counts per cluster
+        clusters_df = load_clusters(cluster_file_path)
+        if clusters_df.empty:
+            print(f"[{key}] Cluster file is empty, skipping.")
+            continue
+        df_output = count_edges_per_cluster(edge_file_path, clusters_df)
 
-    # Convert data to a DataFrame and save to CSV
-    df_output = pd.DataFrame(data)
-    output_path = os.path.join(output_dir, f"{key}_cluster_stats.csv")
-    df_output.to_csv(output_path, index=False)
+        # Save to CSV
+        output_path = os.path.join(args.o, f"{key}_cluster_stats.csv")
+        df_output.to_csv(output_path, index=False)
 
-    print(f"[{key}] Output saved to {output_path}")
+        print(f"[{key}] Output saved to {output_path}")